@@ -1,4 +1,5 @@
 from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
 from datetime import datetime
 from app.observability import (
     performance_monitor, get_observability_health,
@@ -42,7 +43,7 @@ async def detailed_health_check():
         },
         "observability": observability_health,
         "performance": {
-            "total_operations": len(performance_monitor.metrics),
+            "total_operations": performance_monitor.get_operation_count(),
             "slow_operations_count": len(performance_monitor.slow_operations)
         },
         "rl_agent": moderation_agent.get_statistics() if moderation_agent else None
@@ -63,6 +64,14 @@ async def get_metrics():
         "rl_agent_stats": moderation_agent.get_statistics() if moderation_agent else None
     }
 
+@router.get("/metrics/prometheus", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Operation counters in the Prometheus text exposition format"""
+    return PlainTextResponse(
+        performance_monitor.render_prometheus_metrics(),
+        media_type="text/plain; version=0.0.4"
+    )
+
 @router.get("/metrics/performance")
 async def performance_metrics():
     """Detailed performance metrics"""
@@ -70,7 +79,7 @@ async def performance_metrics():
         "timestamp": datetime.utcnow().isoformat(),
         "uptime_seconds": performance_monitor.get_uptime(),
         "performance_summary": performance_monitor.get_performance_summary(),
-        "recent_slow_operations": performance_monitor.slow_operations[-10:] if performance_monitor.slow_operations else []
+        "recent_slow_operations": performance_monitor.get_recent_slow_operations(10)
     }
 
 @router.get("/monitoring-status")
@@ -82,7 +91,7 @@ async def monitoring_status():
         "posthog_enabled": posthog_manager.initialized,
         "performance_monitoring_enabled": True,
         "uptime_seconds": performance_monitor.get_uptime(),
-        "total_metrics_collected": len(performance_monitor.metrics),
+        "total_metrics_collected": performance_monitor.get_operation_count(),
         "slow_operations_count": len(performance_monitor.slow_operations)
     }
 
@@ -9,6 +9,7 @@ import uuid
 
 from ..auth_middleware import jwt_auth, get_current_user_optional
 from ..observability import track_performance, structured_logger, set_user_context
+from ..schemas import ModerationRequest
 
 # For demo purposes, disable authentication
 async def demo_user():
@@ -29,12 +30,6 @@ event_queue = EventQueue()
 router = APIRouter()
 
 # Pydantic models
-class ModerationRequest(BaseModel):
-    content: str
-    content_type: str = Field(..., description="text, image, audio, video, code")
-    metadata: Optional[Dict[str, Any]] = None
-    mcp_metadata: Optional[Dict[str, Any]] = None
-
 class ModerationResponse(BaseModel):
     moderation_id: str
     flagged: bool
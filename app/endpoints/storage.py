@@ -50,7 +50,7 @@ async def list_storage_files(
                 detail=f"Access denied to segment '{segment}'"
             )
 
-        files = storage_manager.list_files(segment)
+        files = await storage_manager.list_files_async(segment)
 
         structured_logger.log_security_event(
             "storage_list_access",
@@ -113,7 +113,7 @@ async def upload_file(
         content_type = file.content_type or "application/octet-stream"
 
         # Save file
-        file_path = storage_manager.save_file(segment, safe_filename, content, content_type)
+        file_path = await storage_manager.save_file_async(segment, safe_filename, content, content_type)
 
         structured_logger.log_security_event(
             "storage_file_upload",
@@ -175,7 +175,7 @@ async def download_file(
             )
 
         # Get file content
-        content = storage_manager.get_file(segment, filename)
+        content = await storage_manager.get_file_async(segment, filename)
 
         if content is None:
             raise HTTPException(status_code=404, detail="File not found")
@@ -249,7 +249,7 @@ async def delete_file(
             )
 
         # Delete file
-        success = storage_manager.delete_file(segment, filename)
+        success = await storage_manager.delete_file_async(segment, filename)
 
         if not success:
             raise HTTPException(status_code=404, detail="File not found or could not be deleted")
@@ -307,7 +307,7 @@ async def cleanup_old_files(
             )
 
         # Perform cleanup
-        cleaned_count = storage_manager.cleanup_old_files(segment, max_age_days)
+        cleaned_count = await storage_manager.cleanup_old_files_async(segment, max_age_days)
 
         structured_logger.log_security_event(
             "storage_cleanup",
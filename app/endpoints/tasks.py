@@ -4,7 +4,7 @@ from datetime import datetime
 import logging
 
 from app.auth_middleware import get_current_user
-from app.task_queue import task_queue
+from app.task_queue import task_queue, TaskQueueFull
 from app.observability import track_performance, structured_logger, set_user_context
 
 logger = logging.getLogger(__name__)
@@ -74,6 +74,8 @@ async def submit_batch_moderation(
 
     except HTTPException:
         raise
+    except TaskQueueFull:
+        raise HTTPException(status_code=429, detail="Task queue is full, please retry later")
     except Exception as e:
         logger.error(f"Error submitting batch moderation for user {user_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to submit batch moderation")
@@ -121,6 +123,8 @@ async def submit_analytics_generation(
 
     except HTTPException:
         raise
+    except TaskQueueFull:
+        raise HTTPException(status_code=429, detail="Task queue is full, please retry later")
     except Exception as e:
         logger.error(f"Error submitting analytics generation for user {user_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to submit analytics generation")
@@ -175,6 +179,8 @@ async def submit_cleanup_operation(
 
     except HTTPException:
         raise
+    except TaskQueueFull:
+        raise HTTPException(status_code=429, detail="Task queue is full, please retry later")
     except Exception as e:
         logger.error(f"Error submitting cleanup operation for user {user_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to submit cleanup operation")
@@ -333,6 +339,8 @@ async def create_test_task(
             "user_id": user_id
         }
 
+    except TaskQueueFull:
+        raise HTTPException(status_code=429, detail="Task queue is full, please retry later")
     except Exception as e:
         logger.error(f"Error creating test task for user {user_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to create test task")
\ No newline at end of file
@@ -9,9 +9,11 @@ from .event_queue import event_queue
 from .feedback_handler import feedback_handler
 from .task_queue import task_queue
 from .security import security_middleware
+from .storage import storage_manager
 from .observability import (
     sentry_manager, posthog_manager, performance_monitor,
-    structured_logger, get_observability_health, track_performance
+    structured_logger, get_observability_health, track_performance,
+    flush_observability, configure_structured_logging
 )
 from .content_clarity_analyzer import create_clarity_analyzer
 
@@ -34,6 +36,7 @@ logging.basicConfig(
         logging.StreamHandler()
     ]
 )
+configure_structured_logging()
 logger = logging.getLogger(__name__)
 
 app = FastAPI(title="RL-Powered Content Moderation API", version="2.0")
@@ -2807,6 +2810,8 @@ async def shutdown_event():
     logger.info("Shutting down services")
     await event_queue.close()
     await feedback_handler.close()
+    storage_manager.flush()
+    flush_observability()
 
 if __name__ == "__main__":
     import uvicorn
@@ -8,12 +8,24 @@ import re
 import os
 import html
 import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from dataclasses import dataclass
 from pathlib import Path
 
 from flagged_words import flagged_words_db, moderate_text_content
 
 logger = logging.getLogger(__name__)
 
+@dataclass(slots=True)
+class Experience:
+    """Single replay buffer transition"""
+    state: str
+    action: int
+    reward: float
+    next_state: str
+    content_id: Optional[str] = None
+    timestamp: float = 0.0
+
 class ModerationAgent:
     """Advanced RL-powered content moderation agent with MCP awareness and persistent learning"""
 
@@ -33,6 +45,11 @@ class ModerationAgent:
         self.access_times = {}  # Track last access time for LRU eviction
         self.update_frequency = {}  # Track update frequency for intelligent eviction
         self.compression_enabled = True  # Enable state compression for memory efficiency
+        self._dirty_flag = False  # Set when persisted state changes; cleared on save
+
+        # Single background worker so state writes don't block training updates
+        self._saver = ThreadPoolExecutor(max_workers=1)
+        self._save_future: Optional[Future] = None
 
         # Moderation history for learning
         self.history = []
@@ -41,7 +58,7 @@ class ModerationAgent:
         self.contents: Dict[str, Dict] = {}
 
         # Replay buffer for batch learning
-        self.replay_buffer: List[Dict] = []
+        self.replay_buffer: List[Experience] = []
         self.max_replay = 2000
 
         # Recent rewards for metrics
@@ -657,6 +674,7 @@ class ModerationAgent:
             self.recent_rewards.append(reward)
             if len(self.recent_rewards) > 1000:
                 self.recent_rewards.pop(0)
+            self._dirty_flag = True
 
             # Find corresponding history entry
             for entry in reversed(self.history[-200:]):  # Look further back
@@ -695,9 +713,8 @@ class ModerationAgent:
 
                     # Update replay buffer with actual reward
                     for replay_entry in reversed(self.replay_buffer[-100:]):
-                        if (replay_entry.get("content_id") == moderation_id or
-                            replay_entry.get("moderation_id") == moderation_id):
-                            replay_entry["reward"] = reward
+                        if replay_entry.content_id == moderation_id:
+                            replay_entry.reward = reward
                             break
 
                     # Perform batch learning occasionally
@@ -706,7 +723,7 @@ class ModerationAgent:
 
                     # Save state occasionally
                     if random.random() < 0.1:  # 10% chance
-                        self._save_state()
+                        self._schedule_save()
 
                     # Send to RL Core for distributed learning
                     await self._send_to_rl_core(moderation_id, reward, entry["state"], action)
@@ -805,6 +822,7 @@ class ModerationAgent:
         state_key = self._generate_state_key(safe_content_id)
         if state_key not in self.q_table:
             self.q_table[state_key] = {str(i): 0.0 for i in range(self.action_dim)}
+            self._dirty_flag = True
 
         logger.debug(f"Registered content {safe_content_id} with state key {state_key}")
 
@@ -960,8 +978,39 @@ class ModerationAgent:
             logger.warning(f"Could not load agent state: {e}")
             self.q_table = {}
 
+    def _snapshot_state(self) -> Dict[str, Any]:
+        """Capture a point-in-time copy of the persisted agent state"""
+        return {
+            "q_table": dict(self.q_table),
+            "epsilon": self.epsilon,
+            "recent_rewards": self.recent_rewards[-100:],  # Keep last 100 rewards
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
     def _save_state(self):
-        """Persist agent state to file with backup"""
+        """Persist agent state to file with backup, waiting until it is written"""
+        # Nothing changed since the last successful save
+        if not self._dirty_flag:
+            return
+
+        self._dirty_flag = False
+        # Write on the saver thread too, so this never races a scheduled save of the same file
+        self._saver.submit(self._save_snapshot, self._snapshot_state()).result()
+
+    def _schedule_save(self):
+        """Persist agent state on the background saver without blocking training"""
+        if not self._dirty_flag:
+            return
+
+        # Coalesce: skip while a previous save is still being written
+        if self._save_future is not None and not self._save_future.done():
+            return
+
+        self._dirty_flag = False
+        self._save_future = self._saver.submit(self._save_snapshot, self._snapshot_state())
+
+    def _save_snapshot(self, state: Dict[str, Any]):
+        """Write a state snapshot to file with backup"""
         try:
             # Validate state path
             safe_path = Path(self.state_path).resolve()
@@ -972,30 +1021,26 @@ class ModerationAgent:
             if not str(safe_path).endswith('.json'):
                 raise ValueError("State file must have .json extension")
 
+            # Write the new state beside the old one so a failed write can't truncate it
+            temp_path = safe_path.with_suffix('.json.tmp')
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f, indent=2)
+
             # Create backup
             if safe_path.exists():
                 backup_path = safe_path.with_suffix('.json.bak')
                 try:
-                    if backup_path.exists():
-                        backup_path.unlink()
-                    safe_path.rename(backup_path)
+                    os.replace(safe_path, backup_path)
                 except (OSError, PermissionError):
                     pass  # Skip backup if file operations fail
 
-            # Save new state
-            state = {
-                "q_table": self.q_table,
-                "epsilon": self.epsilon,
-                "recent_rewards": self.recent_rewards[-100:],  # Keep last 100 rewards
-                "timestamp": datetime.utcnow().isoformat()
-            }
-
-            with open(safe_path, "w", encoding="utf-8") as f:
-                json.dump(state, f, indent=2)
+            os.replace(temp_path, safe_path)
 
             logger.debug("Agent state saved successfully")
 
         except (IOError, OSError, ValueError) as e:
+            # Keep the changes pending so the next save retries them
+            self._dirty_flag = True
             logger.error(f"Could not save agent state: {e}")
 
     def _sync_with_database(self):
@@ -1073,6 +1118,8 @@ class ModerationAgent:
                 if state_key not in self.q_table:
                     self.q_table[state_key] = {str(i): 0.0 for i in range(self.action_dim)}
 
+                self._dirty_flag = True
+
                 # Favor actions that would lead to correct moderation
                 if reward > 0:  # Good moderation
                     if score > 0.5:  # High toxicity - should flag
@@ -1098,26 +1145,43 @@ class ModerationAgent:
         if not self.replay_buffer:
             return
 
+        # Per-state max Q-value, computed lazily and kept current as rows are updated
+        max_q_cache: Dict[str, float] = {}
+
         for _ in range(batches):
             sample = random.sample(self.replay_buffer, min(batch_size, len(self.replay_buffer)))
 
             for experience in sample:
-                state_key = experience["state"]
-                action = str(experience["action"])
-                reward = experience["reward"]
-                next_state_key = experience["next_state"]
+                state_key = experience.state
+                action = str(experience.action)
+                reward = experience.reward
+                next_state_key = experience.next_state
 
                 if state_key not in self.q_table:
                     self.q_table[state_key] = {str(i): 0.0 for i in range(self.action_dim)}
+                    max_q_cache[state_key] = 0.0
                 if next_state_key not in self.q_table:
                     self.q_table[next_state_key] = {str(i): 0.0 for i in range(self.action_dim)}
+                    max_q_cache[next_state_key] = 0.0
 
                 # Q-learning update
-                max_q_next = max(self.q_table[next_state_key].values())
+                max_q_next = max_q_cache.get(next_state_key)
+                if max_q_next is None:
+                    max_q_next = max_q_cache[next_state_key] = max(self.q_table[next_state_key].values())
                 old_q = self.q_table[state_key][action]
                 new_q = old_q + self.learning_rate * (reward + self.gamma * max_q_next - old_q)
-                self.q_table[state_key][action] = max(-100.0, min(100.0, new_q))  # Bounds checking
+                new_q = max(-100.0, min(100.0, new_q))  # Bounds checking
+                self.q_table[state_key][action] = new_q
+                self._dirty_flag = True
+
+                cached_max = max_q_cache.get(state_key)
+                if cached_max is not None:
+                    if new_q >= cached_max:
+                        max_q_cache[state_key] = new_q
+                    elif old_q >= cached_max:
+                        # The previous maximum decreased; recompute on next use
+                        del max_q_cache[state_key]
 
         # Occasionally save state
         if random.random() < 0.1:
-            self._save_state()
\ No newline at end of file
+            self._schedule_save()
\ No newline at end of file
@@ -4,15 +4,20 @@ Observability and monitoring system for RL Content Moderation
 """
 
 import os
+import sys
 import time
 import json
 import logging
-from typing import Dict, Any, Optional, List
-from datetime import datetime, timedelta
-from contextlib import contextmanager
+import threading
+import queue
+from typing import Dict, Any, Optional, List, Deque, Tuple, Callable
 import traceback
 import asyncio
+import inspect
 from functools import wraps
+from array import array
+from collections import deque
+from itertools import islice
 
 # Sentry integration
 SENTRY_AVAILABLE = False
@@ -34,6 +39,17 @@ try:
 except ImportError:
     pass
 
+from .time_utils import iso_now
+
+# orjson for structured log serialization (stdlib json fallback)
+ORJSON_AVAILABLE = False
+orjson = None
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    pass
+
 logger = logging.getLogger(__name__)
 
 class ObservabilityConfig:
@@ -47,17 +63,32 @@ class ObservabilityConfig:
     # PostHog Configuration
     POSTHOG_API_KEY = os.getenv("POSTHOG_API_KEY")
     POSTHOG_HOST = os.getenv("POSTHOG_HOST", "https://us.posthog.com")
+    POSTHOG_BATCH_SIZE = int(os.getenv("POSTHOG_BATCH_SIZE", "100"))  # events per request
+    POSTHOG_FLUSH_INTERVAL = float(os.getenv("POSTHOG_FLUSH_INTERVAL", "5.0"))  # seconds
+    POSTHOG_MAX_QUEUE_SIZE = int(os.getenv("POSTHOG_MAX_QUEUE_SIZE", "10000"))  # events dropped beyond this
 
     # Performance Monitoring
     ENABLE_PERFORMANCE_MONITORING = os.getenv("ENABLE_PERFORMANCE_MONITORING", "true").lower() == "true"
     SLOW_QUERY_THRESHOLD = float(os.getenv("SLOW_QUERY_THRESHOLD", "1.0"))  # seconds
 
+    # Logging
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()  # "text" or "json"
+
     # Feature Flags
     ENABLE_USER_ANALYTICS = os.getenv("ENABLE_USER_ANALYTICS", "true").lower() == "true"
     ENABLE_ERROR_REPORTING = os.getenv("ENABLE_ERROR_REPORTING", "true").lower() == "true"
 
 config = ObservabilityConfig()
 
+# Duration above which an operation is recorded as slow
+_SLOW_OPERATION_MS = config.SLOW_QUERY_THRESHOLD * 1000
+
+# Properties attached to every analytics event; fixed for the process lifetime
+_BASE_EVENT_PROPS = {
+    "service": "rl-content-moderation",
+    "environment": config.SENTRY_ENVIRONMENT
+}
+
 class SentryManager:
     """Sentry integration for error tracking"""
 
@@ -110,11 +141,10 @@ class SentryManager:
             return
 
         try:
-            with sentry_sdk.configure_scope() as scope:
-                if extra_data:
-                    for key, value in extra_data.items():
-                        scope.set_extra(key, value)
-
+            # Extras travel with this event only; no scope push/pop round-trip
+            if extra_data:
+                sentry_sdk.capture_exception(error, extras=extra_data)
+            else:
                 sentry_sdk.capture_exception(error)
         except Exception as e:
             logger.error(f"Failed to send exception to Sentry: {e}")
@@ -125,11 +155,9 @@ class SentryManager:
             return
 
         try:
-            with sentry_sdk.configure_scope() as scope:
-                if extra_data:
-                    for key, value in extra_data.items():
-                        scope.set_extra(key, value)
-
+            if extra_data:
+                sentry_sdk.capture_message(message, level, extras=extra_data)
+            else:
                 sentry_sdk.capture_message(message, level)
         except Exception as e:
             logger.error(f"Failed to send message to Sentry: {e}")
@@ -167,10 +195,17 @@ class PostHogManager:
             return
 
         try:
+            # capture() only enqueues; the client's consumer thread sends
+            # events in batches of flush_at or every flush_interval seconds
             self.client = Posthog(
                 project_api_key=config.POSTHOG_API_KEY,
                 host=config.POSTHOG_HOST,
-                debug=config.SENTRY_ENVIRONMENT == "development"
+                debug=config.SENTRY_ENVIRONMENT == "development",
+                flush_at=config.POSTHOG_BATCH_SIZE,
+                flush_interval=config.POSTHOG_FLUSH_INTERVAL,
+                max_queue_size=config.POSTHOG_MAX_QUEUE_SIZE,
+                sync_mode=False,
+                disable_geoip=True
             )
             self.initialized = True
             logger.info("PostHog initialized successfully")
@@ -184,12 +219,10 @@ class PostHogManager:
             return
 
         try:
-            event_properties = {
-                "timestamp": datetime.utcnow().isoformat(),
-                "service": "rl-content-moderation",
-                "environment": config.SENTRY_ENVIRONMENT,
-                **(properties or {})
-            }
+            # The client stamps each event itself; no timestamp property needed
+            event_properties = _BASE_EVENT_PROPS.copy()
+            if properties:
+                event_properties.update(properties)
 
             self.client.capture(
                 distinct_id=user_id,
@@ -206,13 +239,16 @@ class PostHogManager:
             return
 
         try:
+            user_properties = {
+                "service": _BASE_EVENT_PROPS["service"],
+                "identified_at": iso_now()
+            }
+            if traits:
+                user_properties.update(traits)
+
             self.client.identify(
                 distinct_id=user_id,
-                properties={
-                    "service": "rl-content-moderation",
-                    "identified_at": datetime.utcnow().isoformat(),
-                    **(traits or {})
-                }
+                properties=user_properties
             )
 
         except Exception as e:
@@ -236,69 +272,247 @@ class PostHogManager:
 
         self.track_event(user_id, "feature_used", properties)
 
-class PerformanceMonitor:
-    """Performance monitoring and metrics collection"""
+    def flush(self):
+        """Send any queued events and stop the background consumer"""
+        if not self.initialized:
+            return
+
+        try:
+            self.client.shutdown()
+        except Exception as e:
+            logger.error(f"Failed to flush PostHog events: {e}")
+
+class _MetricsBuffer:
+    """Per-thread metrics not yet merged into the shared PerformanceMonitor arrays"""
+
+    __slots__ = ("pending", "last_flush")
 
     def __init__(self):
-        self.metrics = {}
-        self.slow_operations = []
-        self.start_time = time.time()
+        # (op_id, hour) -> [count, success_count, total, min, max]
+        self.pending: Dict[Tuple[int, int], List[float]] = {}
+        self.last_flush = time.monotonic()
 
-    @contextmanager
-    def measure_operation(self, operation_name: str, user_id: str = None):
+class PerformanceMonitor:
+    """Performance monitoring and metrics collection
+
+    Per-operation metrics are kept in a struct-of-arrays ring: one flat array
+    per field, indexed by ``op_id * HOURS_TRACKED + hour % HOURS_TRACKED``.
+    A slot is reset when it is reused for a newer hour.
+
+    Recording only touches a thread-local buffer; each thread merges its
+    buffer into the shared arrays under a single lock at most once per
+    FLUSH_INTERVAL, and all buffers are merged before a summary is built.
+    """
+
+    MAX_OPERATIONS = 256  # Distinct operation names tracked; least recently used row is evicted beyond this
+    HOURS_TRACKED = 24    # Hourly buckets kept per operation
+    FLUSH_INTERVAL = 1.0  # Seconds between thread-local merges
+
+    def __init__(self):
+        self._op_ids: Dict[str, int] = {}
+        self._op_names: List[str] = []
+
+        slots = self.MAX_OPERATIONS * self.HOURS_TRACKED
+        self._bucket_hour = array('q', [-1]) * slots
+        self._count = array('q', [0]) * slots
+        self._success_count = array('q', [0]) * slots
+        self._total_duration = array('d', [0.0]) * slots
+        self._min_duration = array('d', [float('inf')]) * slots
+        self._max_duration = array('d', [0.0]) * slots
+
+        # Cumulative per-operation counters for Prometheus exposition
+        self._total_ops = array('q', [0]) * self.MAX_OPERATIONS
+        self._total_ops_success = array('q', [0]) * self.MAX_OPERATIONS
+        self._total_ops_duration = array('d', [0.0]) * self.MAX_OPERATIONS
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._buffers: List[_MetricsBuffer] = []
+
+        # Feature-usage events are handed to a background thread, off the request path
+        self._analytics_queue: "queue.SimpleQueue[Optional[Tuple[str, str, bool, int]]]" = queue.SimpleQueue()
+        self._analytics_thread: Optional[threading.Thread] = None
+
+        self.slow_operations: Deque[Dict[str, Any]] = deque(maxlen=100)  # Last 100 slow operations
+        self.start_time = time.monotonic()
+
+    def measure_operation(self, operation_name: str, user_id: str = None) -> "_MeasuredOperation":
         """Context manager to measure operation performance"""
-        start_time = time.time()
-        success = True
-        error = None
+        return _MeasuredOperation(self, operation_name, user_id)
 
-        try:
-            yield
-        except Exception as e:
-            success = False
-            error = str(e)
-            raise
-        finally:
-            duration = (time.time() - start_time) * 1000  # Convert to milliseconds
+    def _finish_operation(self, operation: str, start_ns: int, user_id: Optional[str],
+                          error: Optional[BaseException]):
+        """Record a timed operation that started at perf_counter_ns() == start_ns"""
+        duration_ms = (time.perf_counter_ns() - start_ns) / 1e6
 
-            # Record metrics
-            self._record_performance_metric(operation_name, duration, success, user_id)
+        # Record metrics
+        self._record_performance_metric(operation, duration_ms, error is None, user_id)
 
-            # Track slow operations
-            if duration > config.SLOW_QUERY_THRESHOLD * 1000:
-                self._record_slow_operation(operation_name, duration, user_id, error)
+        # Track slow operations
+        if duration_ms > _SLOW_OPERATION_MS:
+            self._record_slow_operation(operation, duration_ms, user_id,
+                                        str(error) if error is not None else None)
 
     def _record_performance_metric(self, operation: str, duration_ms: float,
                                   success: bool, user_id: str = None):
         """Record performance metric"""
-        metric_key = f"{operation}_{datetime.now().strftime('%Y%m%d_%H')}"
-
-        if metric_key not in self.metrics:
-            self.metrics[metric_key] = {
-                "operation": operation,
-                "count": 0,
-                "total_duration": 0,
-                "success_count": 0,
-                "error_count": 0,
-                "min_duration": float('inf'),
-                "max_duration": 0
-            }
+        op_id = None
+        if config.ENABLE_PERFORMANCE_MONITORING:
+            op_id = self._op_ids.get(operation)
+            if op_id is None:
+                op_id = self._register_operation(operation)
+
+        if op_id is not None:
+            buffer = self._get_thread_buffer()
+            key = (op_id, int(time.time()) // 3600)
+
+            entry = buffer.pending.get(key)
+            if entry is None:
+                buffer.pending[key] = [1, 1 if success else 0, duration_ms, duration_ms, duration_ms]
+            else:
+                entry[0] += 1
+                if success:
+                    entry[1] += 1
+                entry[2] += duration_ms
+                if duration_ms < entry[3]:
+                    entry[3] = duration_ms
+                if duration_ms > entry[4]:
+                    entry[4] = duration_ms
+
+            now = time.monotonic()
+            if now - buffer.last_flush >= self.FLUSH_INTERVAL:
+                with self._lock:
+                    self._merge_buffer(buffer, now)
+
+        # Track in PostHog if user_id available; sent from the analytics thread
+        if user_id and posthog_manager.initialized:
+            if self._analytics_thread is None:
+                self.start_analytics_worker()
+            self._analytics_queue.put((user_id, operation, success, int(duration_ms)))
+
+    def start_analytics_worker(self):
+        """Start the background thread that forwards feature usage to PostHog"""
+        if self._analytics_thread is not None and self._analytics_thread.is_alive():
+            return
 
-        metric = self.metrics[metric_key]
-        metric["count"] += 1
-        metric["total_duration"] += duration_ms
-        metric["min_duration"] = min(metric["min_duration"], duration_ms)
-        metric["max_duration"] = max(metric["max_duration"], duration_ms)
+        self._analytics_thread = threading.Thread(
+            target=self._analytics_worker, name="analytics-worker", daemon=True
+        )
+        self._analytics_thread.start()
 
-        if success:
-            metric["success_count"] += 1
-        else:
-            metric["error_count"] += 1
+    def stop_analytics_worker(self, timeout: float = 5.0):
+        """Drain queued analytics events and stop the background thread"""
+        if self._analytics_thread is None:
+            return
 
-        # Track in PostHog if user_id available
-        if user_id and posthog_manager.initialized:
-            posthog_manager.track_feature_usage(
-                user_id, operation, success, int(duration_ms)
-            )
+        self._analytics_queue.put(None)
+        self._analytics_thread.join(timeout)
+        self._analytics_thread = None
+
+    def _analytics_worker(self):
+        """Forward queued feature-usage events until a None sentinel arrives"""
+        while True:
+            item = self._analytics_queue.get()
+            if item is None:
+                return
+
+            try:
+                posthog_manager.track_feature_usage(*item)
+            except Exception as e:
+                logger.error(f"Failed to forward analytics event: {e}")
+
+    def _get_thread_buffer(self) -> _MetricsBuffer:
+        """Return the calling thread's metrics buffer, creating it on first use"""
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            buffer = self._local.buffer = _MetricsBuffer()
+            with self._lock:
+                self._buffers.append(buffer)
+        return buffer
+
+    def _merge_buffer(self, buffer: _MetricsBuffer, now: float):
+        """Fold a thread buffer into the shared arrays; caller holds the lock (now is monotonic)"""
+        pending, buffer.pending = buffer.pending, {}
+        buffer.last_flush = now
+
+        # Snapshot items: the owning thread may still hold the swapped-out dict
+        for (op_id, hour), (count, success_count, total, min_duration, max_duration) in list(pending.items()):
+            self._total_ops[op_id] += count
+            self._total_ops_success[op_id] += success_count
+            self._total_ops_duration[op_id] += total
+
+            slot = op_id * self.HOURS_TRACKED + hour % self.HOURS_TRACKED
+
+            if self._bucket_hour[slot] > hour:
+                continue  # Slot already reused for a newer hour
+            if self._bucket_hour[slot] < hour:
+                self._bucket_hour[slot] = hour
+                self._count[slot] = 0
+                self._success_count[slot] = 0
+                self._total_duration[slot] = 0.0
+                self._min_duration[slot] = float('inf')
+                self._max_duration[slot] = 0.0
+
+            self._count[slot] += count
+            self._success_count[slot] += success_count
+            self._total_duration[slot] += total
+            if min_duration < self._min_duration[slot]:
+                self._min_duration[slot] = min_duration
+            if max_duration > self._max_duration[slot]:
+                self._max_duration[slot] = max_duration
+
+    def _merge_all_buffers(self):
+        """Fold every thread's pending metrics into the shared arrays"""
+        now = time.monotonic()
+        with self._lock:
+            for buffer in self._buffers:
+                self._merge_buffer(buffer, now)
+
+    def _register_operation(self, operation: str) -> int:
+        """Assign a metrics row to a new operation name"""
+        # Interned keys let later lookups with the same name hit dict identity checks
+        operation = sys.intern(operation)
+
+        with self._lock:
+            op_id = self._op_ids.get(operation)
+            if op_id is not None:
+                return op_id
+
+            if len(self._op_names) < self.MAX_OPERATIONS:
+                op_id = len(self._op_names)
+                self._op_names.append(operation)
+            else:
+                op_id = self._evict_least_recent_operation()
+                self._op_names[op_id] = operation
+
+            self._op_ids[operation] = op_id
+            return op_id
+
+    def _evict_least_recent_operation(self) -> int:
+        """Free the row of the operation with the oldest latest bucket; caller holds the lock"""
+        # Settle pending counts so none are credited to the row's next owner
+        now = time.monotonic()
+        for buffer in self._buffers:
+            self._merge_buffer(buffer, now)
+
+        def last_active_hour(op_id: int) -> int:
+            base = op_id * self.HOURS_TRACKED
+            return max(self._bucket_hour[base:base + self.HOURS_TRACKED])
+
+        op_id = min(range(len(self._op_names)), key=last_active_hour)
+        evicted = self._op_names[op_id]
+        del self._op_ids[evicted]
+
+        base = op_id * self.HOURS_TRACKED
+        for slot in range(base, base + self.HOURS_TRACKED):
+            self._bucket_hour[slot] = -1
+            self._count[slot] = 0
+        self._total_ops[op_id] = 0
+        self._total_ops_success[op_id] = 0
+        self._total_ops_duration[op_id] = 0.0
+
+        logger.debug(f"Performance metrics table full, evicted operation: {evicted}")
+        return op_id
 
     def _record_slow_operation(self, operation: str, duration_ms: float,
                               user_id: str = None, error: str = None):
@@ -306,17 +520,13 @@ class PerformanceMonitor:
         slow_op = {
             "operation": operation,
             "duration_ms": duration_ms,
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": iso_now(),
             "user_id": user_id,
             "error": error
         }
 
         self.slow_operations.append(slow_op)
 
-        # Keep only last 100 slow operations
-        if len(self.slow_operations) > 100:
-            self.slow_operations = self.slow_operations[-100:]
-
         # Report to Sentry if very slow
         if duration_ms > config.SLOW_QUERY_THRESHOLD * 2000:  # 2x threshold
             sentry_manager.capture_message(
@@ -326,52 +536,163 @@ class PerformanceMonitor:
             )
 
     def get_performance_summary(self) -> Dict[str, Any]:
-        """Get performance metrics summary"""
-        summary = {}
+        """Get performance metrics summary over the tracked hours"""
+        self._merge_all_buffers()
 
-        for metric_key, metric in self.metrics.items():
-            if metric["count"] > 0:
-                summary[metric["operation"]] = {
-                    "count": metric["count"],
-                    "avg_duration_ms": metric["total_duration"] / metric["count"],
-                    "success_rate": metric["success_count"] / metric["count"],
-                    "min_duration_ms": metric["min_duration"],
-                    "max_duration_ms": metric["max_duration"]
+        summary = {}
+        oldest_hour = int(time.time()) // 3600 - self.HOURS_TRACKED
+
+        for op_id, operation in enumerate(self._op_names):
+            count = success_count = 0
+            total_duration = max_duration = 0.0
+            min_duration = float('inf')
+
+            base = op_id * self.HOURS_TRACKED
+            for slot in range(base, base + self.HOURS_TRACKED):
+                if self._bucket_hour[slot] <= oldest_hour or not self._count[slot]:
+                    continue
+                count += self._count[slot]
+                success_count += self._success_count[slot]
+                total_duration += self._total_duration[slot]
+                min_duration = min(min_duration, self._min_duration[slot])
+                max_duration = max(max_duration, self._max_duration[slot])
+
+            if count > 0:
+                summary[operation] = {
+                    "count": count,
+                    "avg_duration_ms": total_duration / count,
+                    "success_rate": success_count / count,
+                    "min_duration_ms": min_duration,
+                    "max_duration_ms": max_duration
                 }
 
         return {
             "metrics": summary,
             "slow_operations_count": len(self.slow_operations),
-            "recent_slow_operations": self.slow_operations[-5:] if self.slow_operations else []
+            "recent_slow_operations": self.get_recent_slow_operations(5)
         }
 
+    def get_recent_slow_operations(self, limit: int) -> List[Dict[str, Any]]:
+        """Most recent slow operations, oldest first"""
+        recent = list(islice(reversed(self.slow_operations), limit))
+        recent.reverse()
+        return recent
+
+    def get_operation_count(self) -> int:
+        """Number of distinct operations being tracked"""
+        return len(self._op_names)
+
+    def render_prometheus_metrics(self) -> str:
+        """Render cumulative operation counters in the Prometheus text exposition format"""
+        self._merge_all_buffers()
+
+        lines = [
+            "# HELP rl_operations_total Measured operations by outcome.",
+            "# TYPE rl_operations_total counter"
+        ]
+        durations = [
+            "# HELP rl_operation_duration_milliseconds_total Total time spent in measured operations.",
+            "# TYPE rl_operation_duration_milliseconds_total counter"
+        ]
+
+        for op_id, operation in enumerate(self._op_names):
+            label = _prometheus_label(operation)
+            success_count = self._total_ops_success[op_id]
+            lines.append(f'rl_operations_total{{operation="{label}",outcome="success"}} {success_count}')
+            lines.append(f'rl_operations_total{{operation="{label}",outcome="error"}} '
+                         f'{self._total_ops[op_id] - success_count}')
+            durations.append(f'rl_operation_duration_milliseconds_total{{operation="{label}"}} '
+                             f'{self._total_ops_duration[op_id]!r}')
+
+        lines.extend(durations)
+        lines.extend([
+            "# HELP rl_uptime_seconds Seconds since the monitor started.",
+            "# TYPE rl_uptime_seconds gauge",
+            f"rl_uptime_seconds {self.get_uptime()!r}"
+        ])
+        return "\n".join(lines) + "\n"
+
     def get_uptime(self) -> float:
         """Get application uptime in seconds"""
-        return time.time() - self.start_time
+        return time.monotonic() - self.start_time
+
+def _prometheus_label(value: str) -> str:
+    """Escape a Prometheus label value"""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class _MeasuredOperation:
+    """Timing context returned by PerformanceMonitor.measure_operation"""
+
+    __slots__ = ("monitor", "operation", "user_id", "start_ns")
+
+    def __init__(self, monitor: PerformanceMonitor, operation: str, user_id: Optional[str]):
+        self.monitor = monitor
+        self.operation = operation
+        self.user_id = user_id
+
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        failed = exc_type is not None and issubclass(exc_type, Exception)
+        self.monitor._finish_operation(self.operation, self.start_ns, self.user_id,
+                                       exc_value if failed else None)
+
+        return False
+
+# Attributes every LogRecord has; anything else on a record came from extra=
+_LOG_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+class StructuredJSONFormatter(logging.Formatter):
+    """Render log records, including their extra= fields, as one JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _LOG_RECORD_ATTRS:
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+
+        if ORJSON_AVAILABLE:
+            return orjson.dumps(payload, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+        return json.dumps(payload, default=str)
 
 class StructuredLogger:
     """Structured logging for better observability"""
 
+    SUCCESS_LEVEL = 25
+    SECURITY_LEVEL = 35
+
     def __init__(self):
         self.setup_logging()
 
     def setup_logging(self):
         """Setup structured logging configuration"""
         # Add custom log levels
-        logging.addLevelName(25, "SUCCESS")
-        logging.addLevelName(35, "SECURITY")
+        logging.addLevelName(self.SUCCESS_LEVEL, "SUCCESS")
+        logging.addLevelName(self.SECURITY_LEVEL, "SECURITY")
 
     def log_api_request(self, method: str, path: str, status_code: int,
                        duration_ms: float, user_id: str = None,
                        request_size: int = None, response_size: int = None):
         """Log API request with structured data"""
+        if not logger.isEnabledFor(logging.INFO):
+            return
+
         log_data = {
             "event_type": "api_request",
             "method": method,
             "path": path,
             "status_code": status_code,
             "duration_ms": duration_ms,
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": iso_now()
         }
 
         if user_id:
@@ -386,12 +707,15 @@ class StructuredLogger:
     def log_moderation_event(self, content_type: str, flagged: bool, score: float,
                            user_id: str = None, duration_ms: float = None):
         """Log moderation events"""
+        if not logger.isEnabledFor(logging.INFO):
+            return
+
         log_data = {
             "event_type": "moderation",
             "content_type": content_type,
             "flagged": flagged,
             "score": score,
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": iso_now()
         }
 
         if user_id:
@@ -404,11 +728,14 @@ class StructuredLogger:
     def log_security_event(self, event_type: str, client_ip: str, user_id: str = None,
                           details: Dict[str, Any] = None):
         """Log security events"""
+        if not logger.isEnabledFor(self.SECURITY_LEVEL):
+            return
+
         log_data = {
             "event_type": "security_event",
             "security_event": event_type,
             "client_ip": client_ip,
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": iso_now()
         }
 
         if user_id:
@@ -416,7 +743,7 @@ class StructuredLogger:
         if details:
             log_data["details"] = details
 
-        logger.log(35, "Security Event", extra=log_data)
+        logger.log(self.SECURITY_LEVEL, "Security Event", extra=log_data)
 
 # Simple manager classes
 class SimpleSentryManager:
@@ -432,6 +759,7 @@ class SimplePostHogManager:
     def track_event(self, *args, **kwargs): pass
     def identify_user(self, *args, **kwargs): pass
     def track_feature_usage(self, *args, **kwargs): pass
+    def flush(self): pass
 
 def initialize_observability():
     """Initialize observability services safely"""
@@ -442,6 +770,9 @@ def initialize_observability():
     performance_monitor = PerformanceMonitor()
     structured_logger = StructuredLogger()
 
+    if posthog_manager.initialized:
+        performance_monitor.start_analytics_worker()
+
     return sentry_manager, posthog_manager, performance_monitor, structured_logger
 
 # Initialize on import
@@ -451,49 +782,95 @@ sentry_manager, posthog_manager, performance_monitor, structured_logger = initia
 def track_performance(operation_name: str):
     """Decorator to track function performance"""
     def decorator(func):
-        @wraps(func)
-        async def async_wrapper(*args, **kwargs):
-            with performance_monitor.measure_operation(operation_name):
-                return await func(*args, **kwargs)
+        # Nothing would consume the measurement; leave the function untouched
+        if not (config.ENABLE_PERFORMANCE_MONITORING or sentry_manager.initialized
+                or posthog_manager.initialized):
+            return func
+
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start_ns = time.perf_counter_ns()
+                error = None
+                try:
+                    return await func(*args, **kwargs)
+                except Exception as e:
+                    error = e
+                    raise
+                finally:
+                    performance_monitor._finish_operation(operation_name, start_ns, None, error)
+
+            return async_wrapper
 
         @wraps(func)
         def sync_wrapper(*args, **kwargs):
-            with performance_monitor.measure_operation(operation_name):
+            start_ns = time.perf_counter_ns()
+            error = None
+            try:
                 return func(*args, **kwargs)
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                performance_monitor._finish_operation(operation_name, start_ns, None, error)
 
-        return async_wrapper if asyncio.iscoroutinefunction(func) else sync_wrapper
+        return sync_wrapper
     return decorator
 
+def _user_id_extractor(func) -> Optional[Callable[[Dict[str, Any]], Optional[str]]]:
+    """Build the kwargs -> user_id lookup for func, or None if it can never receive one"""
+    params = inspect.signature(func).parameters
+    var_kwargs = any(p.kind is inspect.Parameter.VAR_KEYWORD for p in params.values())
+    has_user_id = var_kwargs or "user_id" in params
+    has_current_user = var_kwargs or "current_user" in params
+
+    if has_user_id and has_current_user:
+        return lambda kwargs: kwargs.get('user_id') or getattr(kwargs.get('current_user'), 'user_id', None)
+    if has_user_id:
+        return lambda kwargs: kwargs.get('user_id')
+    if has_current_user:
+        return lambda kwargs: getattr(kwargs.get('current_user'), 'user_id', None)
+    return None
+
 def track_user_action(action_name: str):
     """Decorator to track user actions in PostHog"""
     def decorator(func):
-        @wraps(func)
-        async def async_wrapper(*args, **kwargs):
-            # Extract user_id from function arguments or kwargs
-            user_id = kwargs.get('user_id') or getattr(kwargs.get('current_user'), 'user_id', None)
+        # Events only go to PostHog; skip wrapping entirely when it is disabled
+        if not posthog_manager.initialized:
+            return func
+
+        # Extract user_id from kwargs; functions that cannot receive one are left unwrapped
+        get_user_id = _user_id_extractor(func)
+        if get_user_id is None:
+            return func
+
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                user_id = get_user_id(kwargs)
+
+                try:
+                    result = await func(*args, **kwargs)
+                except Exception as e:
+                    if user_id:
+                        posthog_manager.track_event(user_id, action_name, {
+                            "success": False,
+                            "error": str(e)
+                        })
+                    raise
 
-            try:
-                result = await func(*args, **kwargs)
                 if user_id:
                     posthog_manager.track_event(user_id, action_name, {"success": True})
                 return result
-            except Exception as e:
-                if user_id:
-                    posthog_manager.track_event(user_id, action_name, {
-                        "success": False,
-                        "error": str(e)
-                    })
-                raise
+
+            return async_wrapper
 
         @wraps(func)
         def sync_wrapper(*args, **kwargs):
-            user_id = kwargs.get('user_id') or getattr(kwargs.get('current_user'), 'user_id', None)
+            user_id = get_user_id(kwargs)
 
             try:
                 result = func(*args, **kwargs)
-                if user_id:
-                    posthog_manager.track_event(user_id, action_name, {"success": True})
-                return result
             except Exception as e:
                 if user_id:
                     posthog_manager.track_event(user_id, action_name, {
@@ -502,7 +879,11 @@ def track_user_action(action_name: str):
                     })
                 raise
 
-        return async_wrapper if asyncio.iscoroutinefunction(func) else sync_wrapper
+            if user_id:
+                posthog_manager.track_event(user_id, action_name, {"success": True})
+            return result
+
+        return sync_wrapper
     return decorator
 
 # Utility functions
@@ -523,6 +904,20 @@ def set_user_context(user_id: str, username: str = None, email: str = None):
             "email": email
         })
 
+def configure_structured_logging():
+    """Switch root log handlers to JSON output when LOG_FORMAT=json"""
+    if config.LOG_FORMAT != "json":
+        return
+
+    formatter = StructuredJSONFormatter()
+    for handler in logging.getLogger().handlers:
+        handler.setFormatter(formatter)
+
+def flush_observability():
+    """Flush buffered analytics events, e.g. on application shutdown"""
+    performance_monitor.stop_analytics_worker()
+    posthog_manager.flush()
+
 def get_observability_health() -> Dict[str, Any]:
     """Get health status of observability services"""
     return {
@@ -1,15 +1,16 @@
-from pydantic import BaseModel, Field, validator
-from typing import Optional, Any, Dict, List, Union
-from datetime import datetime
+from pydantic import BaseModel, ConfigDict, Field, validator
+from typing import Optional, Any, Dict, List, Union, Literal
 import uuid
 
+from .time_utils import iso_now
+
 # Standard API response format
 class StandardResponse(BaseModel):
     """Standardized API response format for consistency"""
     success: bool = Field(..., description="Whether the request was successful")
     message: str = Field(..., description="Human-readable response message")
     data: Optional[Any] = Field(None, description="Response data payload")
-    timestamp: str = Field(default_factory=lambda: datetime.utcnow().isoformat(), description="Response timestamp")
+    timestamp: str = Field(default_factory=iso_now, description="Response timestamp")
     error_code: Optional[str] = Field(None, description="Error code if applicable")
     meta: Optional[Dict[str, Any]] = Field(None, description="Additional metadata")
     request_id: Optional[str] = Field(None, description="Unique request identifier")
@@ -21,7 +22,7 @@ class ErrorResponse(BaseModel):
     message: str = Field(..., description="Error message")
     error_code: str = Field(..., description="Specific error code")
     details: Optional[Dict[str, Any]] = Field(None, description="Additional error details")
-    timestamp: str = Field(default_factory=lambda: datetime.utcnow().isoformat(), description="Error timestamp")
+    timestamp: str = Field(default_factory=iso_now, description="Error timestamp")
     request_id: Optional[str] = Field(None, description="Unique request identifier")
 
 # Pagination schema
@@ -40,16 +41,20 @@ class PaginatedResponse(BaseModel):
     message: str = Field("Data retrieved successfully", description="Response message")
     data: List[Any] = Field(..., description="Data items")
     meta: PaginationMeta = Field(..., description="Pagination metadata")
-    timestamp: str = Field(default_factory=lambda: datetime.utcnow().isoformat(), description="Response timestamp")
+    timestamp: str = Field(default_factory=iso_now, description="Response timestamp")
     request_id: Optional[str] = Field(None, description="Unique request identifier")
 
 # Authentication schemas
 class UserRegister(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     username: str = Field(..., min_length=3, max_length=50)
     password: str = Field(..., min_length=8)
     email: Optional[str] = Field(None, pattern=r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
 
 class UserLogin(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     username: str = Field(..., min_length=1)
     password: str = Field(..., min_length=1)
 
@@ -62,6 +67,8 @@ class Token(BaseModel):
     username: str
 
 class RefreshToken(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     refresh_token: str
 
 class UserProfile(BaseModel):
@@ -75,12 +82,15 @@ class UserProfile(BaseModel):
 
 # Existing schemas
 class FeedbackPayload(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     content_id: str
     user_id: str
-    feedback_type: str = Field(..., pattern="^(positive|negative)$")
+    feedback_type: Literal["positive", "negative"]
     comment: Optional[str] = None
 
 class ModerationRequest(BaseModel):
-    content_id: str
-    content_data: str  # Can be text, a URL, or base64 encoded data
-    content_type: str = Field(..., pattern="^(text|image|video)$")
+    content: str
+    content_type: str = Field(..., description="text, image, audio, video, code")
+    metadata: Optional[Dict[str, Any]] = None
+    mcp_metadata: Optional[Dict[str, Any]] = None
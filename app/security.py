@@ -5,18 +5,31 @@ Includes rate limiting, input sanitization, and security headers
 """
 
 import os
+import json
 import secrets
 import time
 import re
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple, Union
+from functools import lru_cache
 from datetime import datetime, timedelta
 from fastapi import HTTPException, Request, status
 from fastapi.responses import JSONResponse
 import hashlib
+import hmac
+from collections import OrderedDict
+from itertools import islice
 
 logger = logging.getLogger(__name__)
 
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+# str.translate table deleting null bytes and control characters except \t, \n, \r
+_CTRL_TRANSLATE = {c: None for c in range(32) if c not in (9, 10, 13)}
+_CTRL_SEARCH_RE = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+_UNSAFE_FILENAME_RE = re.compile(r'[^A-Za-z0-9._-]+')
+_DANGEROUS_FILE_CHARS = frozenset('<>:"|?*\0')
+
 # Security Configuration
 class SecurityConfig:
     # Rate Limiting Configuration with safe parsing
@@ -53,96 +66,118 @@ class SecurityConfig:
 
 config = SecurityConfig()
 
+# Rate limit header values that never change after startup
+_MAX_HOURLY_STR = str(config.MAX_REQUESTS_PER_HOUR)
+_MAX_MINUTELY_STR = str(config.MAX_REQUESTS_PER_MINUTE)
+
 # Rate Limiting Classes
 class RateLimiter:
-    """In-memory rate limiter with cleanup"""
+    """In-memory token bucket rate limiter with incremental cleanup"""
+
+    # Largest rate limit window; a bucket idle this long has refilled completely
+    MAX_WINDOW_SECONDS = 3600
+    # Most idle buckets dropped per request, so cleanup never stalls a request
+    CLEANUP_BATCH = 32
 
     def __init__(self):
-        self.requests: Dict[str, list] = {}
-        self.cleanup_interval = 300  # 5 minutes
-        self.last_cleanup = time.time()
+        # key -> [tokens, last_refill], ordered from least to most recently used
+        self.buckets: "OrderedDict[str, list]" = OrderedDict()
 
     def is_allowed(self, key: str, max_requests: int, window_seconds: int) -> bool:
         """Check if request is allowed within rate limit"""
-        now = time.time()
-        self._cleanup_old_entries()
+        now = time.monotonic()
+        self._cleanup_old_entries(now)
 
-        if key not in self.requests:
-            self.requests[key] = []
+        rate = max_requests / window_seconds
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            self.buckets[key] = bucket = [max_requests, now]
+        else:
+            self.buckets.move_to_end(key)
 
-        # Remove old entries outside window
-        self.requests[key] = [
-            timestamp for timestamp in self.requests[key]
-            if now - timestamp < window_seconds
-        ]
+        # Refill tokens for the time elapsed since the last request
+        bucket[0] = min(max_requests, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
 
-        # Check if under limit
-        if len(self.requests[key]) >= max_requests:
-            return False
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return True
+        return False
 
-        # Add current request
-        self.requests[key].append(now)
-        return True
-
-    def _cleanup_old_entries(self):
-        """Remove old rate limiting entries with memory-efficient cleanup"""
-        now = time.time()
-        if now - self.last_cleanup > self.cleanup_interval:
-            keys_to_remove = []
-
-            for key in list(self.requests.keys()):
-                # Keep only entries within the maximum window (1 hour)
-                original_count = len(self.requests[key])
-                self.requests[key] = [
-                    timestamp for timestamp in self.requests[key]
-                    if now - timestamp < 3600
-                ]
-
-                # Remove empty entries
-                if not self.requests[key]:
-                    keys_to_remove.append(key)
-                # Log significant cleanup for monitoring
-                elif len(self.requests[key]) < original_count * 0.5:  # More than 50% cleaned
-                    logger.debug(f"Cleaned up {original_count - len(self.requests[key])} old entries for key {key}")
-
-            # Remove empty keys
-            for key in keys_to_remove:
-                del self.requests[key]
-
-            # Periodic deep cleanup: remove very old keys entirely
-            if len(self.requests) > 10000:  # If we have too many keys
-                cutoff_time = now - 7200  # 2 hours ago
-                old_keys = []
-                for key, timestamps in self.requests.items():
-                    if timestamps and max(timestamps) < cutoff_time:
-                        old_keys.append(key)
-
-                for key in old_keys[:1000]:  # Clean up to 1000 keys at a time
-                    del self.requests[key]
-
-                if old_keys:
-                    logger.info(f"Deep cleanup removed {len(old_keys[:1000])} stale rate limit keys")
-
-            self.last_cleanup = now
+    def remaining(self, key: str, max_requests: int, window_seconds: int) -> int:
+        """Requests still available for a key right now, without consuming one"""
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            return max_requests
+
+        tokens = bucket[0] + (time.monotonic() - bucket[1]) * (max_requests / window_seconds)
+        return int(min(max_requests, tokens))
+
+    def _cleanup_old_entries(self, now: float):
+        """Drop idle buckets from the least recently used end"""
+        # Dropping a fully refilled bucket is indistinguishable from keeping it,
+        # and since buckets are kept in usage order only the stale head is visited
+        cutoff_time = now - self.MAX_WINDOW_SECONDS
+        buckets = self.buckets
+        for _ in range(self.CLEANUP_BATCH):
+            if not buckets:
+                break
+            key = next(iter(buckets))
+            if buckets[key][1] >= cutoff_time:
+                break
+            del buckets[key]
 
 class AuthRateLimiter:
     """Rate limiter specifically for authentication attempts"""
 
+    # Opportunistic sweep of stale entries every N recorded attempts
+    SWEEP_EVERY = 1000
+    SWEEP_BATCH = 128
+
     def __init__(self):
         self.attempts: Dict[str, Dict[str, Any]] = {}
+        self._ops = 0
+
+    def _is_stale(self, attempt_data: Dict[str, Any], now: float) -> bool:
+        """Entry is unlocked and has seen no attempts for twice the lockout duration"""
+        locked_until = attempt_data.get("locked_until")
+        if locked_until and now < locked_until:
+            return False
+        return now - attempt_data["last_attempt"] > config.AUTH_LOCKOUT_DURATION * 2
+
+    def _expire(self, client_ip: str, now: float) -> None:
+        """Forget a client's stale attempt history when it is seen again"""
+        attempt_data = self.attempts.get(client_ip)
+        if attempt_data is not None and self._is_stale(attempt_data, now):
+            del self.attempts[client_ip]
+
+    def _sweep(self, now: float) -> None:
+        """Prune a bounded batch of stale entries so memory stays bounded"""
+        stale = [ip for ip, attempt_data in islice(self.attempts.items(), self.SWEEP_BATCH)
+                 if self._is_stale(attempt_data, now)]
+        for ip in stale:
+            del self.attempts[ip]
 
     def is_locked(self, client_ip: str) -> bool:
         """Check if IP is currently locked out"""
+        now = time.monotonic()
+        self._expire(client_ip, now)
+
         if client_ip in self.attempts:
             attempt_data = self.attempts[client_ip]
             locked_until = attempt_data.get("locked_until")
-            if locked_until and time.time() < locked_until:
+            if locked_until and now < locked_until:
                 return True
         return False
 
     def record_attempt(self, client_ip: str, success: bool) -> Dict[str, Any]:
         """Record authentication attempt"""
-        current_time = time.time()
+        current_time = time.monotonic()
+        self._expire(client_ip, current_time)
+
+        self._ops += 1
+        if self._ops % self.SWEEP_EVERY == 0:
+            self._sweep(current_time)
 
         if client_ip not in self.attempts:
             self.attempts[client_ip] = {
@@ -192,12 +227,12 @@ class InputSanitizer:
         if not isinstance(input_str, str):
             raise ValueError("Input must be a string")
 
-        # Remove null bytes
-        cleaned = input_str.replace('\x00', '')
+        # Fast path: most content has no control characters and fits the limit
+        if len(input_str) <= max_length and not _CTRL_SEARCH_RE.search(input_str):
+            return input_str.strip()
 
-        # Remove dangerous control characters
-        cleaned = ''.join(char for char in cleaned
-                         if ord(char) >= 32 or char in '\n\t\r')
+        # Remove null bytes and dangerous control characters
+        cleaned = input_str.translate(_CTRL_TRANSLATE)
 
         # Truncate to max length
         if len(cleaned) > max_length:
@@ -215,8 +250,7 @@ class InputSanitizer:
         filename = os.path.basename(filename)
 
         # Allow only safe characters
-        safe_chars = set("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789._-")
-        filename = ''.join(c for c in filename if c in safe_chars)
+        filename = _UNSAFE_FILENAME_RE.sub('', filename)
 
         if not filename:
             raise ValueError("Filename contains no valid characters")
@@ -239,8 +273,7 @@ class InputSanitizer:
             return False
 
         # Check for dangerous characters
-        dangerous_chars = ['<', '>', ':', '"', '|', '?', '*', '\0']
-        return not any(char in filename for char in dangerous_chars)
+        return _DANGEROUS_FILE_CHARS.isdisjoint(filename)
 
     @staticmethod
     def validate_content_type(content_type: str) -> bool:
@@ -255,23 +288,53 @@ class InputSanitizer:
             return False
 
         # Basic email pattern check
-        pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        return bool(re.match(pattern, email)) and len(email) <= 255
+        return bool(_EMAIL_RE.match(email)) and len(email) <= 255
 
 # Security Manager
 class SecurityManager:
     """Central security management"""
 
+    AUTH_PATHS = ("/api/users/login", "/api/users/register")
+
     def __init__(self):
         self.api_rate_limiter = api_rate_limiter
         self.auth_rate_limiter = auth_rate_limiter
 
+        # (key_tag, max_requests, window_seconds, retry_after, detail) per endpoint group
+        self._auth_policy = ("auth", 10, 3600, "3600",  # 10 per hour
+                             "Too many authentication requests. Please try again later.")
+        self._moderate_policy = ("moderate", config.MAX_REQUESTS_PER_HOUR, 3600, "3600",
+                                 "Rate limit exceeded for moderation requests.")
+        self._api_policy = ("api", config.MAX_REQUESTS_PER_MINUTE, 60, "60",
+                            "Rate limit exceeded. Please try again later.")
+
+        # Paths are few in practice, so resolve each one to its policy only once
+        self.resolve_policy = lru_cache(maxsize=4096)(self._match_policy)
+
+    def _match_policy(self, path: str) -> Tuple[str, int, int, str, str]:
+        """Pick the rate limit policy for a request path"""
+        if path.startswith("/api/auth/") or path in self.AUTH_PATHS:
+            # Stricter limits for auth endpoints
+            return self._auth_policy
+        if path.startswith("/api/moderate"):
+            # Moderate limits for moderation endpoints
+            return self._moderate_policy
+        # General API limits
+        return self._api_policy
+
     def get_client_ip(self, request: Request) -> str:
         """Extract client IP with proxy support"""
+        # Reuse the IP resolved earlier for this request by security_middleware
+        cached_ip = getattr(getattr(request, "state", None), "client_ip", None)
+        if isinstance(cached_ip, str):
+            return cached_ip
+
         # Check for forwarded headers (proxy/load balancer)
         forwarded_for = request.headers.get("X-Forwarded-For")
         if forwarded_for:
-            return forwarded_for.split(",")[0].strip()
+            # First hop is the original client; avoid splitting the whole header
+            comma = forwarded_for.find(",")
+            return (forwarded_for[:comma] if comma >= 0 else forwarded_for).strip()
 
         real_ip = request.headers.get("X-Real-IP")
         if real_ip:
@@ -286,33 +349,15 @@ class SecurityManager:
     def check_rate_limit(self, request: Request) -> None:
         """Apply rate limiting to request"""
         client_ip = self.get_client_ip(request)
-        path = request.url.path
 
         # Different limits for different endpoints
-        if path.startswith("/api/auth/") or path in ["/api/users/login", "/api/users/register"]:
-            # Stricter limits for auth endpoints
-            if not self.api_rate_limiter.is_allowed(f"auth:{client_ip}", 10, 3600):  # 10 per hour
-                raise HTTPException(
-                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                    detail="Too many authentication requests. Please try again later.",
-                    headers={"Retry-After": "3600"}
-                )
-        elif path.startswith("/api/moderate"):
-            # Moderate limits for moderation endpoints
-            if not self.api_rate_limiter.is_allowed(f"moderate:{client_ip}", config.MAX_REQUESTS_PER_HOUR, 3600):
-                raise HTTPException(
-                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                    detail="Rate limit exceeded for moderation requests.",
-                    headers={"Retry-After": "3600"}
-                )
-        else:
-            # General API limits
-            if not self.api_rate_limiter.is_allowed(f"api:{client_ip}", config.MAX_REQUESTS_PER_MINUTE, 60):
-                raise HTTPException(
-                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                    detail="Rate limit exceeded. Please try again later.",
-                    headers={"Retry-After": "60"}
-                )
+        key_tag, max_requests, window_seconds, retry_after, detail = self.resolve_policy(request.url.path)
+        if not self.api_rate_limiter.is_allowed(f"{key_tag}:{client_ip}", max_requests, window_seconds):
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=detail,
+                headers={"Retry-After": retry_after}
+            )
 
     def check_auth_rate_limit(self, request: Request) -> None:
         """Check authentication rate limiting"""
@@ -384,34 +429,39 @@ def add_security_headers(response, request: Request):
 
     # Add rate limit headers
     client_ip = security_manager.get_client_ip(request)
-    remaining_hourly = max(0, config.MAX_REQUESTS_PER_HOUR - len(api_rate_limiter.requests.get(f"api:{client_ip}", [])))
-    remaining_minutely = max(0, config.MAX_REQUESTS_PER_MINUTE - len(api_rate_limiter.requests.get(f"api:{client_ip}", [])))
+    remaining_minutely = api_rate_limiter.remaining(f"api:{client_ip}", config.MAX_REQUESTS_PER_MINUTE, 60)
+    used = config.MAX_REQUESTS_PER_MINUTE - remaining_minutely
+    remaining_hourly = max(0, config.MAX_REQUESTS_PER_HOUR - used)
 
     response.headers["X-RateLimit-Remaining-Hourly"] = str(remaining_hourly)
     response.headers["X-RateLimit-Remaining-Minutely"] = str(remaining_minutely)
-    response.headers["X-RateLimit-Limit-Hourly"] = str(config.MAX_REQUESTS_PER_HOUR)
-    response.headers["X-RateLimit-Limit-Minutely"] = str(config.MAX_REQUESTS_PER_MINUTE)
+    response.headers["X-RateLimit-Limit-Hourly"] = _MAX_HOURLY_STR
+    response.headers["X-RateLimit-Limit-Minutely"] = _MAX_MINUTELY_STR
 
     return response
 
 async def security_middleware(request: Request, call_next):
     """FastAPI middleware for security checks"""
     try:
+        # Resolve the client IP once for every check below
+        request.state.client_ip = security_manager.get_client_ip(request)
+
         # Apply rate limiting
         security_manager.check_rate_limit(request)
 
         # Check auth rate limiting for auth endpoints
-        if request.url.path.startswith("/api/auth/") or request.url.path in ["/api/users/login", "/api/users/register"]:
+        if security_manager.resolve_policy(request.url.path)[0] == "auth":
             security_manager.check_auth_rate_limit(request)
 
         # Validate and sanitize input for POST/PUT requests
-        if request.method in ["POST", "PUT", "PATCH"]:
+        if request.method in ("POST", "PUT", "PATCH"):
+            # BaseHTTPMiddleware replays a body read here to the endpoint itself
+            body_bytes = await request.body()
+            request.state.raw_body = body_bytes
+
             try:
-                body = await request.json()
-                sanitized_body = security_manager.validate_input(body)
-                # Note: In FastAPI, we can't directly modify the request body
-                # Validation is performed but original body is preserved
-                # Individual endpoints should use validated data from dependencies
+                # Endpoints can use the sanitized body from request.state instead of re-parsing
+                request.state.sanitized_body = security_manager.validate_input(json.loads(body_bytes))
             except Exception:
                 # If body parsing fails, continue without sanitization
                 # This prevents breaking requests with invalid JSON
@@ -440,15 +490,15 @@ def generate_secure_token(length: int = 32) -> str:
     """Generate cryptographically secure token"""
     return secrets.token_urlsafe(length)
 
-def hash_string(input_str: str) -> str:
-    """Create SHA-256 hash of string (for non-sensitive data)"""
-    return hashlib.sha256(input_str.encode()).hexdigest()
+def hash_string(input_str: Union[str, bytes]) -> str:
+    """Create 128-bit BLAKE2b hash of string or bytes (for non-sensitive data)"""
+    data = input_str.encode() if isinstance(input_str, str) else input_str
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
 
 def constant_time_compare(a: str, b: str) -> bool:
     """Constant time string comparison to prevent timing attacks"""
-    if len(a) != len(b):
-        return False
-    return sum(a[i] != b[i] for i in range(len(a))) == 0
+    # compare_digest only accepts ASCII str, so compare the UTF-8 bytes
+    return hmac.compare_digest(a.encode(), b.encode())
 
 # Security event logging
 def log_security_event(event_type: str, details: Dict[str, Any], request: Request):
@@ -16,12 +16,26 @@ try:
 except ImportError:
     VADER_AVAILABLE = False
 
+_WORD_RE = re.compile(r'\b\w+\b')
+_BANG_RE = re.compile(r'!{2,}')
+_QMARK_RE = re.compile(r'\?{2,}')
+
 class SentimentAnalyzer:
     """Advanced sentiment analysis for content moderation"""
 
     def __init__(self):
         self.vader_analyzer = SentimentIntensityAnalyzer() if VADER_AVAILABLE else None
 
+        # The analysis method is fixed for the process lifetime, so bind it once
+        if self.vader_analyzer:
+            self._analyze = self._analyze_with_vader
+            self._method_name = "vader"
+            self._method_confidence = 1.0
+        else:
+            self._analyze = self._analyze_simple
+            self._method_name = "simple"
+            self._method_confidence = 0.7
+
         # Extended word lists for content moderation context
         self.positive_words = {
             'good', 'great', 'excellent', 'amazing', 'awesome', 'love', 'like',
@@ -48,6 +62,19 @@ class SentimentAnalyzer:
             'illegitimate', 'unauthorized', 'prohibited', 'banned', 'forbidden'
         }
 
+        self.toxic_words = {'hate', 'stupid', 'idiot', 'dumb', 'suck', 'crap', 'shit', 'fuck'}
+
+        # Context terms are matched as substrings of the lowercased text
+        self._legal_context_re = re.compile(r'constitutional|illegal|unlawful|compliant|violation')
+        self._improvement_re = re.compile(r'should|could|would|better|improve|suggest')
+
+        # Signed weight per word; legal terms weigh 1.5x general sentiment words
+        self._weights: Dict[str, float] = {}
+        for words, weight in ((self.positive_words, 1), (self.negative_words, -1),
+                              (self.legal_positive, 1.5), (self.legal_negative, -1.5)):
+            for word in words:
+                self._weights[word] = self._weights.get(word, 0) + weight
+
         logger.info(f"SentimentAnalyzer initialized with VADER: {VADER_AVAILABLE}")
 
     def analyze_sentiment(self, text: str, rating: int = None, context: str = "general") -> Dict[str, Any]:
@@ -58,18 +85,22 @@ class SentimentAnalyzer:
         if not text:
             text = ""
 
+        # Lowercase and tokenize once, sharing the results between the helpers
+        lowered = text.lower()
+        counts = self._count_categories(_WORD_RE.findall(lowered))
+
         # Use VADER if available, otherwise fallback to simple analysis
-        if self.vader_analyzer and text.strip():
-            base_sentiment = self._analyze_with_vader(text, rating)
+        if text.strip():
+            base_sentiment = self._analyze(text, rating, counts)
         else:
-            base_sentiment = self._analyze_simple(text, rating)
+            base_sentiment = self._analyze_simple(text, rating, counts)
 
         # Context-specific adjustments
-        adjusted_sentiment = self._apply_context_adjustments(base_sentiment, text, context)
+        adjusted_sentiment = self._apply_context_adjustments(base_sentiment, text, context, lowered)
 
         # Calculate engagement and other metrics
         engagement_score = self._calculate_engagement(text, rating)
-        toxicity_score = self._calculate_toxicity(text)
+        toxicity_score = self._calculate_toxicity(text, counts)
         confidence_score = self._calculate_confidence(text, rating)
 
         return {
@@ -82,11 +113,11 @@ class SentimentAnalyzer:
             "word_count": len(text.split()) if text else 0,
             "has_rating": rating is not None,
             "rating": rating,
-            "analysis_method": "vader" if self.vader_analyzer else "simple"
+            "analysis_method": self._method_name
         }
 
-    def _analyze_with_vader(self, text: str, rating: int = None) -> Dict[str, Any]:
-        """Analyze sentiment using VADER"""
+    def _analyze_with_vader(self, text: str, rating: int = None, counts: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Analyze sentiment using VADER (counts is unused; it keeps the signature of _analyze_simple)"""
         scores = self.vader_analyzer.polarity_scores(text)
         compound = scores['compound']
 
@@ -113,18 +144,28 @@ class SentimentAnalyzer:
             "vader_scores": scores
         }
 
-    def _analyze_simple(self, text: str, rating: int = None) -> Dict[str, Any]:
-        """Simple sentiment analysis fallback"""
-        # Clean and tokenize text
-        words = re.findall(r'\b\w+\b', text.lower()) if text else []
+    def _count_categories(self, words: List[str]) -> Dict[str, Any]:
+        """Sum signed sentiment weights and count toxic words in a single pass"""
+        weights = self._weights
+        toxic_words = self.toxic_words
+        sentiment = 0
+        toxic = 0
 
-        # Count sentiment words
-        positive_count = sum(1 for word in words if word in self.positive_words)
-        negative_count = sum(1 for word in words if word in self.negative_words)
+        for word in words:
+            sentiment += weights.get(word, 0)
+            if word in toxic_words:
+                toxic += 1
 
-        # Legal context words
-        legal_pos_count = sum(1 for word in words if word in self.legal_positive)
-        legal_neg_count = sum(1 for word in words if word in self.legal_negative)
+        return {
+            "total": len(words),
+            "sentiment": sentiment,
+            "toxic": toxic
+        }
+
+    def _analyze_simple(self, text: str, rating: int = None, counts: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Simple sentiment analysis fallback"""
+        if counts is None:
+            counts = self._count_categories(_WORD_RE.findall(text.lower()) if text else [])
 
         # Determine sentiment based on rating and text
         if rating:
@@ -138,12 +179,8 @@ class SentimentAnalyzer:
                 label = "neutral"
                 score = 0.0
         else:
-            # Use text analysis
-            total_sentiment = positive_count - negative_count
-            legal_sentiment = legal_pos_count - legal_neg_count
-
-            # Weight legal terms higher
-            combined_sentiment = total_sentiment + (legal_sentiment * 1.5)
+            # Use text analysis (legal terms are weighted higher)
+            combined_sentiment = counts["sentiment"]
 
             if combined_sentiment > 0:
                 label = "positive"
@@ -160,25 +197,22 @@ class SentimentAnalyzer:
             "score": round(score, 3)
         }
 
-    def _apply_context_adjustments(self, base_sentiment: Dict[str, Any], text: str, context: str) -> Dict[str, Any]:
+    def _apply_context_adjustments(self, base_sentiment: Dict[str, Any], text: str, context: str,
+                                   lowered: str = None) -> Dict[str, Any]:
         """Apply context-specific sentiment adjustments"""
         adjusted = base_sentiment.copy()
+        if lowered is None:
+            lowered = text.lower()
 
         if context == "legal":
             # In legal context, certain terms have stronger weight
-            legal_terms = ['constitutional', 'illegal', 'unlawful', 'compliant', 'violation']
-            has_legal_terms = any(term in text.lower() for term in legal_terms)
-
-            if has_legal_terms:
+            if self._legal_context_re.search(lowered):
                 # Increase magnitude of sentiment for legal discussions
                 adjusted["score"] = adjusted["score"] * 1.2
 
         elif context == "moderation_feedback":
             # In moderation feedback, look for specific improvement suggestions
-            improvement_terms = ['should', 'could', 'would', 'better', 'improve', 'suggest']
-            has_improvement = any(term in text.lower() for term in improvement_terms)
-
-            if has_improvement and adjusted["label"] == "negative":
+            if adjusted["label"] == "negative" and self._improvement_re.search(lowered):
                 # Constructive criticism might be more neutral
                 adjusted["score"] = adjusted["score"] * 0.7
 
@@ -206,23 +240,23 @@ class SentimentAnalyzer:
 
         return round(base_engagement, 3)
 
-    def _calculate_toxicity(self, text: str) -> float:
+    def _calculate_toxicity(self, text: str, counts: Dict[str, Any] = None) -> float:
         """Calculate toxicity score (0-1)"""
         if not text:
             return 0.0
 
-        words = re.findall(r'\b\w+\b', text.lower())
-        total_words = len(words)
+        if counts is None:
+            counts = self._count_categories(_WORD_RE.findall(text.lower()))
+        total_words = counts["total"]
 
         if total_words == 0:
             return 0.0
 
         # Count toxic words
-        toxic_words = ['hate', 'stupid', 'idiot', 'dumb', 'suck', 'crap', 'shit', 'fuck']
-        toxic_count = sum(1 for word in words if word in toxic_words)
+        toxic_count = counts["toxic"]
 
         # Check for repeated punctuation (anger indicator)
-        anger_indicators = len(re.findall(r'[!]{2,}', text)) + len(re.findall(r'[?]{2,}', text))
+        anger_indicators = len(_BANG_RE.findall(text)) + len(_QMARK_RE.findall(text))
 
         # Calculate toxicity score
         word_toxicity = toxic_count / total_words
@@ -251,8 +285,7 @@ class SentimentAnalyzer:
             confidence_factors.append(0.5)  # No rating = medium confidence
 
         # Analysis method confidence
-        method_confidence = 1.0 if self.vader_analyzer else 0.7
-        confidence_factors.append(method_confidence)
+        confidence_factors.append(self._method_confidence)
 
         # Average confidence
         avg_confidence = sum(confidence_factors) / len(confidence_factors)
@@ -279,17 +312,21 @@ class SentimentAnalyzer:
 
         total_count = len(analyses)
 
-        # Count sentiments
+        # Count sentiments and accumulate scores in a single pass
         sentiment_counts = {"positive": 0, "negative": 0, "neutral": 0}
+        total_polarity = total_engagement = total_toxicity = total_confidence = 0
         for analysis in analyses:
-            sentiment = analysis.get("sentiment", "neutral")
-            sentiment_counts[sentiment] += 1
+            sentiment_counts[analysis.get("sentiment", "neutral")] += 1
+            total_polarity += analysis.get("polarity_score", 0)
+            total_engagement += analysis.get("engagement_score", 0)
+            total_toxicity += analysis.get("toxicity_score", 0)
+            total_confidence += analysis.get("confidence", 0)
 
         # Calculate averages
-        avg_polarity = sum(a.get("polarity_score", 0) for a in analyses) / total_count
-        avg_engagement = sum(a.get("engagement_score", 0) for a in analyses) / total_count
-        avg_toxicity = sum(a.get("toxicity_score", 0) for a in analyses) / total_count
-        avg_confidence = sum(a.get("confidence", 0) for a in analyses) / total_count
+        avg_polarity = total_polarity / total_count
+        avg_engagement = total_engagement / total_count
+        avg_toxicity = total_toxicity / total_count
+        avg_confidence = total_confidence / total_count
 
         return {
             "total_analyses": total_count,
@@ -5,20 +5,85 @@ Supports local filesystem, AWS S3, and Supabase Storage
 """
 
 import os
+import io
+import re
+import mmap
+import asyncio
 import json
 import time
+import threading
+import queue
+import itertools
+from collections import OrderedDict
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, Optional, List
-from datetime import datetime
 import logging
 
+from .time_utils import iso_now
+
+ORJSON_AVAILABLE = False
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    pass
+
+ZSTD_AVAILABLE = False
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    pass
+
+# Every zstd frame starts with these bytes
+ZSTD_FRAME_MAGIC = b"\x28\xb5\x2f\xfd"
+
 logger = logging.getLogger(__name__)
 
+# Shared pool for concurrent byte-range S3 downloads
+_s3_range_executor = ThreadPoolExecutor(max_workers=10, thread_name_prefix="s3-range")
+
+def _dumps_json(data: Dict[str, Any]) -> bytes:
+    """Serialize data as indented UTF-8 JSON bytes"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+
+def _loads_json(raw: bytes) -> Any:
+    """Parse JSON straight from bytes without decoding to str first"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+# Plain names that need no basename() stripping
+_SIMPLE_FILENAME_RE = re.compile(r'[A-Za-z0-9._-]{1,255}')
+
+def _safe_filename(config: "StorageConfig", segment: str, filename: str) -> str:
+    """Validate the segment and reduce filename to a bare name inside it"""
+    if segment not in config.SEGMENTS_SET:
+        raise ValueError(f"Invalid segment: {segment}")
+
+    if _SIMPLE_FILENAME_RE.fullmatch(filename) and filename not in ('.', '..'):
+        return filename
+
+    safe_filename = os.path.basename(filename)
+    if not safe_filename or safe_filename in ['.', '..']:
+        raise ValueError("Invalid filename")
+    return safe_filename
+
+def _s3_error_code(error: Exception) -> Optional[str]:
+    """The error code of a botocore ClientError, or None for other exceptions"""
+    return getattr(error, "response", {}).get("Error", {}).get("Code")
+
+class StorageReadError(Exception):
+    """A read failed for some reason other than the file not existing"""
+
 class StorageConfig:
     """Storage configuration"""
 
     # Backend selection
-    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")  # "local", "s3", "supabase"
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")  # "local", "s3", "supabase", "hybrid"
 
     # Local storage
     LOCAL_STORAGE_PATH = Path(os.getenv("LOCAL_STORAGE_PATH", "storage"))
@@ -36,6 +101,28 @@ class StorageConfig:
 
     # Storage segments
     SEGMENTS = ["moderations", "feedback", "analytics", "logs", "uploads", "temp"]
+    SEGMENTS_SET = frozenset(SEGMENTS)
+
+    # Seconds a list_files result is served from memory
+    try:
+        LIST_CACHE_TTL = float(os.getenv("STORAGE_LIST_TTL", "60"))
+    except (ValueError, TypeError):
+        LIST_CACHE_TTL = 60.0
+    LIST_CACHE_MAX_ENTRIES = 1000
+
+    # Seconds a "file not found" result is remembered, and how many are kept
+    NEGATIVE_CACHE_TTL = 30.0
+    NEGATIVE_CACHE_MAX_ENTRIES = 10000
+
+    # Hybrid backend: payloads below this size are served locally and mirrored to S3
+    HYBRID_LOCAL_MAX_BYTES = 6 * 1024 * 1024
+
+    # Transparent compression of large text/JSON artifacts ("none" or "zstd")
+    COMPRESSION = os.getenv("STORAGE_COMPRESSION", "none").lower()
+    COMPRESS_MIN_BYTES = 4096
+    COMPRESSED_SUFFIX = ".zst"
+    # Files whose stored variant (compressed or not) is remembered without a listing
+    VARIANT_CACHE_MAX_ENTRIES = 10000
 
 class StorageBackend:
     """Abstract base class for storage backends"""
@@ -52,12 +139,25 @@ class StorageBackend:
     def get_file(self, segment: str, filename: str) -> Optional[bytes]:
         raise NotImplementedError
 
+    def read_file(self, segment: str, filename: str) -> Optional[bytes]:
+        """Like get_file, but None means the file doesn't exist; other failures raise StorageReadError"""
+        content = self.get_file(segment, filename)
+        if content is None:
+            # get_file can't tell a missing file from a failed read
+            raise StorageReadError(f"Could not read {segment}/{filename}")
+        return content
+
     def get_text(self, segment: str, filename: str) -> Optional[str]:
         raise NotImplementedError
 
     def get_json(self, segment: str, filename: str) -> Optional[Dict[str, Any]]:
         raise NotImplementedError
 
+    def get_fileview(self, segment: str, filename: str) -> Optional[memoryview]:
+        """Read-only view of a file's content; backends may avoid copying it"""
+        content = self.get_file(segment, filename)
+        return memoryview(content) if content is not None else None
+
     def list_files(self, segment: str) -> List[str]:
         raise NotImplementedError
 
@@ -67,84 +167,157 @@ class StorageBackend:
     def cleanup_old_files(self, segment: str, max_age_days: int) -> int:
         raise NotImplementedError
 
+    def flush(self):
+        """Wait for any background writes to finish"""
+
 class LocalStorageBackend(StorageBackend):
     """Local filesystem storage backend"""
 
+    # Files at least this large are memory-mapped by get_fileview
+    MMAP_THRESHOLD = 1024 * 1024
+
     def __init__(self, config: StorageConfig):
         self.config = config
         self._init_storage()
 
     def _init_storage(self):
         """Initialize storage directory structure"""
+        # Paths are kept as plain strings past this point; os.path.join is much
+        # cheaper than Path arithmetic on the per-request hot path
+        base = str(self.config.LOCAL_STORAGE_PATH)
+        self._segment_dirs: Dict[str, str] = {}
         for segment in self.config.SEGMENTS:
-            (self.config.LOCAL_STORAGE_PATH / segment).mkdir(parents=True, exist_ok=True)
+            segment_dir = os.path.join(base, segment)
+            os.makedirs(segment_dir, exist_ok=True)
+            self._segment_dirs[segment] = segment_dir
 
-    def _get_safe_path(self, segment: str, filename: str) -> Path:
-        """Get safe path within storage directory"""
-        if segment not in self.config.SEGMENTS:
-            raise ValueError(f"Invalid segment: {segment}")
-
-        safe_filename = os.path.basename(filename)
-        if not safe_filename or safe_filename in ['.', '..']:
-            raise ValueError("Invalid filename")
+        # The storage root doesn't move, so resolve it once
+        self._root_str = os.path.realpath(base)
 
-        path = self.config.LOCAL_STORAGE_PATH / segment / safe_filename
+    def _get_safe_path(self, segment: str, filename: str) -> str:
+        """Get safe path within storage directory"""
+        safe_filename = _safe_filename(self.config, segment, filename)
+        path = os.path.join(self._segment_dirs[segment], safe_filename)
 
-        # Security check: ensure path is within storage directory
-        if not str(path.resolve()).startswith(str(self.config.LOCAL_STORAGE_PATH.resolve())):
+        # Security check: ensure path is within storage directory. The candidate is
+        # still resolved on every call so a symlink pointing outside is caught.
+        if os.path.commonpath((self._root_str, os.path.realpath(path))) != self._root_str:
             raise ValueError("Path outside storage directory")
 
         return path
 
+    @staticmethod
+    def _write_bytes(path: str, content: bytes):
+        """Write content with raw os.write calls, bypassing the 8 KiB BufferedWriter"""
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            view = memoryview(content)
+            while view:
+                written = os.write(fd, view)
+                view = view[written:]
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def _read_bytes(path: str) -> Optional[bytes]:
+        """Read a whole file with one open/fstat/read, or None if it does not exist"""
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        try:
+            size = os.fstat(fd).st_size
+            data = os.read(fd, size)
+            if len(data) == size:
+                return data
+
+            # Short read (or the file grew): keep reading until EOF
+            chunks = [data]
+            while True:
+                chunk = os.read(fd, max(size, 65536))
+                if not chunk:
+                    return b"".join(chunks)
+                chunks.append(chunk)
+        finally:
+            os.close(fd)
+
     def save_file(self, segment: str, filename: str, content: bytes, content_type: str = "application/octet-stream") -> str:
         path = self._get_safe_path(segment, filename)
-        path.write_bytes(content)
-        return str(path)
+        self._write_bytes(path, content)
+        return path
 
     def save_text(self, segment: str, filename: str, content: str) -> str:
         path = self._get_safe_path(segment, filename)
-        path.write_text(content, encoding="utf-8")
-        return str(path)
+        self._write_bytes(path, content.encode("utf-8"))
+        return path
 
     def save_json(self, segment: str, filename: str, data: Dict[str, Any]) -> str:
-        content = json.dumps(data, ensure_ascii=False, indent=2)
-        return self.save_text(segment, filename, content)
+        return self.save_file(segment, filename, _dumps_json(data), "application/json")
 
     def get_file(self, segment: str, filename: str) -> Optional[bytes]:
+        try:
+            return self.read_file(segment, filename)
+        except StorageReadError as e:
+            logger.error(str(e))
+        return None
+
+    def read_file(self, segment: str, filename: str) -> Optional[bytes]:
+        try:
+            path = self._get_safe_path(segment, filename)
+            return self._read_bytes(path)
+        except Exception as e:
+            raise StorageReadError(f"Error reading file {segment}/{filename}: {e}") from e
+
+    def get_fileview(self, segment: str, filename: str) -> Optional[memoryview]:
+        """Memory-map large files so the page cache serves reads without a copy"""
         try:
             path = self._get_safe_path(segment, filename)
-            if path.exists():
-                return path.read_bytes()
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            return None
         except Exception as e:
             logger.error(f"Error reading file {segment}/{filename}: {e}")
-        return None
+            return None
+
+        try:
+            if os.fstat(fd).st_size < self.MMAP_THRESHOLD:
+                return memoryview(self._read_bytes(path) or b"")
+            # The mapping stays valid after the descriptor is closed
+            return memoryview(mmap.mmap(fd, 0, access=mmap.ACCESS_READ))
+        except Exception as e:
+            logger.error(f"Error reading file {segment}/{filename}: {e}")
+            return None
+        finally:
+            os.close(fd)
 
     def get_text(self, segment: str, filename: str) -> Optional[str]:
         try:
             path = self._get_safe_path(segment, filename)
-            if path.exists():
-                return path.read_text(encoding="utf-8")
+            content = self._read_bytes(path)
+            if content is not None:
+                return content.decode("utf-8")
         except Exception as e:
             logger.error(f"Error reading text file {segment}/{filename}: {e}")
         return None
 
     def get_json(self, segment: str, filename: str) -> Optional[Dict[str, Any]]:
         try:
-            text = self.get_text(segment, filename)
-            if text:
-                return json.loads(text)
+            raw = self.get_file(segment, filename)
+            if raw:
+                return _loads_json(raw)
         except Exception as e:
             logger.error(f"Error reading JSON file {segment}/{filename}: {e}")
         return None
 
     def list_files(self, segment: str) -> List[str]:
         try:
-            if segment not in self.config.SEGMENTS:
+            if segment not in self.config.SEGMENTS_SET:
                 return []
 
-            segment_path = self.config.LOCAL_STORAGE_PATH / segment
-            if segment_path.exists():
-                return [f.name for f in segment_path.iterdir() if f.is_file()]
+            with os.scandir(self._segment_dirs[segment]) as entries:
+                return [entry.name for entry in entries if entry.is_file()]
+        except FileNotFoundError:
+            pass
         except Exception as e:
             logger.error(f"Error listing files in {segment}: {e}")
         return []
@@ -152,31 +325,32 @@ class LocalStorageBackend(StorageBackend):
     def delete_file(self, segment: str, filename: str) -> bool:
         try:
             path = self._get_safe_path(segment, filename)
-            if path.exists():
-                path.unlink()
-                return True
+            os.unlink(path)
+            return True
+        except FileNotFoundError:
+            pass
         except Exception as e:
             logger.error(f"Error deleting file {segment}/{filename}: {e}")
         return False
 
     def cleanup_old_files(self, segment: str, max_age_days: int) -> int:
         try:
-            if segment not in self.config.SEGMENTS:
-                return 0
-
-            segment_path = self.config.LOCAL_STORAGE_PATH / segment
-            if not segment_path.exists():
+            if segment not in self.config.SEGMENTS_SET:
                 return 0
 
             cutoff_time = time.time() - (max_age_days * 86400)
             cleaned_count = 0
 
-            for file_path in segment_path.iterdir():
-                if file_path.is_file() and file_path.stat().st_mtime < cutoff_time:
-                    file_path.unlink()
-                    cleaned_count += 1
+            # DirEntry caches the file type from readdir and its stat result
+            with os.scandir(self._segment_dirs[segment]) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.stat().st_mtime < cutoff_time:
+                        os.unlink(entry.path)
+                        cleaned_count += 1
 
             return cleaned_count
+        except FileNotFoundError:
+            return 0
         except Exception as e:
             logger.error(f"Error cleaning up old files in {segment}: {e}")
             return 0
@@ -184,44 +358,82 @@ class LocalStorageBackend(StorageBackend):
 class S3StorageBackend(StorageBackend):
     """AWS S3 storage backend"""
 
+    # Payloads at or above this size are uploaded as concurrent multipart parts
+    MULTIPART_THRESHOLD = 8 * 1024 * 1024
+    MULTIPART_CHUNKSIZE = 50 * 1024 * 1024
+    MAX_TRANSFER_CONCURRENCY = 10
+    # Objects larger than one range are downloaded as concurrent byte-range GETs
+    RANGE_PART_SIZE = 16 * 1024 * 1024
+    # Restarts allowed when the object changes in the middle of a ranged download
+    DOWNLOAD_ATTEMPTS = 3
+    DELETE_BATCH_SIZE = 1000
+
     def __init__(self, config: StorageConfig):
         self.config = config
         self._s3_client = None
+        self._transfer_config = None
+        # Deletes batches while the next listing page is being fetched
+        self._delete_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="s3-delete")
+
+        # Create the client up front so the first request doesn't pay for it
+        try:
+            self._get_s3_client()
+        except ImportError as e:
+            logger.warning(str(e))
 
     def _get_s3_client(self):
         if self._s3_client is None:
             try:
                 import boto3
+                from boto3.s3.transfer import TransferConfig
+                from botocore.config import Config
                 self._s3_client = boto3.client(
                     's3',
                     region_name=self.config.S3_REGION,
                     aws_access_key_id=self.config.AWS_ACCESS_KEY_ID,
-                    aws_secret_access_key=self.config.AWS_SECRET_ACCESS_KEY
+                    aws_secret_access_key=self.config.AWS_SECRET_ACCESS_KEY,
+                    # Enough pooled connections for multipart, range and delete workers
+                    config=Config(
+                        max_pool_connections=50,
+                        retries={'max_attempts': 10, 'mode': 'adaptive'},
+                        tcp_keepalive=True,
+                        s3={'addressing_style': 'virtual'}
+                    )
+                )
+                self._transfer_config = TransferConfig(
+                    multipart_threshold=self.MULTIPART_THRESHOLD,
+                    multipart_chunksize=self.MULTIPART_CHUNKSIZE,
+                    max_concurrency=self.MAX_TRANSFER_CONCURRENCY,
+                    use_threads=True
                 )
             except ImportError:
                 raise ImportError("boto3 is required for S3 backend. Install with: pip install boto3")
         return self._s3_client
 
     def _get_s3_key(self, segment: str, filename: str) -> str:
-        if segment not in self.config.SEGMENTS:
-            raise ValueError(f"Invalid segment: {segment}")
-
-        safe_filename = os.path.basename(filename)
-        if not safe_filename or safe_filename in ['.', '..']:
-            raise ValueError("Invalid filename")
-
-        return f"{segment}/{safe_filename}"
+        return f"{segment}/{_safe_filename(self.config, segment, filename)}"
 
     def save_file(self, segment: str, filename: str, content: bytes, content_type: str = "application/octet-stream") -> str:
         s3_key = self._get_s3_key(segment, filename)
         client = self._get_s3_client()
 
-        client.put_object(
-            Bucket=self.config.S3_BUCKET_NAME,
-            Key=s3_key,
-            Body=content,
-            ContentType=content_type
-        )
+        if len(content) < self.MULTIPART_THRESHOLD:
+            # Small payloads: a single request beats multipart setup
+            client.put_object(
+                Bucket=self.config.S3_BUCKET_NAME,
+                Key=s3_key,
+                Body=content,
+                ContentType=content_type
+            )
+        else:
+            # Large payloads: upload parts concurrently over several connections
+            client.upload_fileobj(
+                io.BytesIO(content),
+                self.config.S3_BUCKET_NAME,
+                s3_key,
+                ExtraArgs={"ContentType": content_type},
+                Config=self._transfer_config
+            )
 
         return f"s3://{self.config.S3_BUCKET_NAME}/{s3_key}"
 
@@ -229,19 +441,83 @@ class S3StorageBackend(StorageBackend):
         return self.save_file(segment, filename, content.encode('utf-8'), "text/plain")
 
     def save_json(self, segment: str, filename: str, data: Dict[str, Any]) -> str:
-        content = json.dumps(data, ensure_ascii=False, indent=2)
-        return self.save_file(segment, filename, content.encode('utf-8'), "application/json")
+        return self.save_file(segment, filename, _dumps_json(data), "application/json")
 
     def get_file(self, segment: str, filename: str) -> Optional[bytes]:
+        try:
+            return self.read_file(segment, filename)
+        except StorageReadError as e:
+            logger.error(str(e))
+            return None
+
+    def read_file(self, segment: str, filename: str) -> Optional[bytes]:
         try:
             s3_key = self._get_s3_key(segment, filename)
             client = self._get_s3_client()
-
+            return self._download(client, s3_key)
+        except Exception as e:
+            # A missing object is an expected outcome, not an error
+            if _s3_error_code(e) in ("NoSuchKey", "404"):
+                return None
+            raise StorageReadError(f"Error reading file from S3 {segment}/{filename}: {e}") from e
+
+    def _get_range(self, client, s3_key: str, start: int, end: int, etag: str) -> bytes:
+        # IfMatch makes S3 refuse the range if the object was replaced since the first one
+        response = client.get_object(Bucket=self.config.S3_BUCKET_NAME, Key=s3_key,
+                                     Range=f"bytes={start}-{end}", IfMatch=etag)
+        return response['Body'].read()
+
+    def _download(self, client, s3_key: str) -> bytes:
+        """Download an object, restarting if it is overwritten part-way through"""
+        for attempt in range(1, self.DOWNLOAD_ATTEMPTS + 1):
+            try:
+                return self._download_ranges(client, s3_key)
+            except Exception as e:
+                if _s3_error_code(e) not in ("PreconditionFailed", "412") or attempt == self.DOWNLOAD_ATTEMPTS:
+                    raise
+                logger.warning(f"S3 object {s3_key} changed during download, retrying")
+
+    def _download_ranges(self, client, s3_key: str) -> bytes:
+        """Download an object, fetching large ones as concurrent byte ranges"""
+        part_size = self.RANGE_PART_SIZE
+        try:
+            # The first range doubles as the size probe, so small objects need one request
+            response = client.get_object(Bucket=self.config.S3_BUCKET_NAME, Key=s3_key, Range=f"bytes=0-{part_size - 1}")
+        except Exception as e:
+            # Zero-length objects reject any range
+            if _s3_error_code(e) != "InvalidRange":
+                raise
             response = client.get_object(Bucket=self.config.S3_BUCKET_NAME, Key=s3_key)
             return response['Body'].read()
-        except Exception as e:
-            logger.error(f"Error reading file from S3 {segment}/{filename}: {e}")
-            return None
+
+        first_part = response['Body'].read()
+        content_range = response.get('ContentRange')
+        total_size = int(content_range.rsplit('/', 1)[1]) if content_range else len(first_part)
+        if total_size <= len(first_part):
+            return first_part
+
+        # Fetch the remaining ranges concurrently into a preallocated buffer
+        buffer = bytearray(total_size)
+        view = memoryview(buffer)
+        view[:len(first_part)] = first_part
+
+        etag = response['ETag']
+        starts = range(len(first_part), total_size, part_size)
+        futures = [
+            (start, _s3_range_executor.submit(self._get_range, client, s3_key, start,
+                                              min(start + part_size, total_size) - 1, etag))
+            for start in starts
+        ]
+        try:
+            for start, future in futures:
+                chunk = future.result()
+                view[start:start + len(chunk)] = chunk
+        except Exception:
+            for _, future in futures:
+                future.cancel()
+            raise
+
+        return bytes(buffer)
 
     def get_text(self, segment: str, filename: str) -> Optional[str]:
         try:
@@ -254,26 +530,20 @@ class S3StorageBackend(StorageBackend):
 
     def get_json(self, segment: str, filename: str) -> Optional[Dict[str, Any]]:
         try:
-            text = self.get_text(segment, filename)
-            if text:
-                return json.loads(text)
+            raw = self.get_file(segment, filename)
+            if raw:
+                return _loads_json(raw)
         except Exception as e:
             logger.error(f"Error reading JSON from S3 {segment}/{filename}: {e}")
         return None
 
     def list_files(self, segment: str) -> List[str]:
         try:
-            if segment not in self.config.SEGMENTS:
+            if segment not in self.config.SEGMENTS_SET:
                 return []
 
-            client = self._get_s3_client()
-            response = client.list_objects_v2(
-                Bucket=self.config.S3_BUCKET_NAME,
-                Prefix=f"{segment}/"
-            )
-
             files = []
-            for obj in response.get('Contents', []):
+            for obj in self._iter_objects(segment):
                 filename = obj['Key'].replace(f"{segment}/", "")
                 if filename and '/' not in filename:
                     files.append(filename)
@@ -283,6 +553,24 @@ class S3StorageBackend(StorageBackend):
             logger.error(f"Error listing S3 files in {segment}: {e}")
             return []
 
+    def _iter_objects(self, segment: str):
+        """Yield every object under a segment, following list_objects_v2 pagination"""
+        paginator = self._get_s3_client().get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.config.S3_BUCKET_NAME, Prefix=f"{segment}/"):
+            yield from page.get('Contents', [])
+
+    def _delete_batch(self, client, objects: List[Dict[str, str]]) -> int:
+        """Delete up to 1000 keys in one request and return how many were removed"""
+        response = client.delete_objects(
+            Bucket=self.config.S3_BUCKET_NAME,
+            Delete={'Objects': objects, 'Quiet': True}
+        )
+        # Quiet mode only reports failures
+        errors = response.get('Errors', [])
+        for error in errors:
+            logger.error(f"Error deleting S3 file {error.get('Key')}: {error.get('Message')}")
+        return len(objects) - len(errors)
+
     def delete_file(self, segment: str, filename: str) -> bool:
         try:
             s3_key = self._get_s3_key(segment, filename)
@@ -296,24 +584,25 @@ class S3StorageBackend(StorageBackend):
 
     def cleanup_old_files(self, segment: str, max_age_days: int) -> int:
         try:
-            if segment not in self.config.SEGMENTS:
+            if segment not in self.config.SEGMENTS_SET:
                 return 0
 
             client = self._get_s3_client()
-            response = client.list_objects_v2(
-                Bucket=self.config.S3_BUCKET_NAME,
-                Prefix=f"{segment}/"
-            )
-
             cutoff_time = time.time() - (max_age_days * 86400)
-            cleaned_count = 0
 
-            for obj in response.get('Contents', []):
+            # delete_objects accepts up to 1000 keys per request
+            futures = []
+            batch = []
+            for obj in self._iter_objects(segment):
                 if obj['LastModified'].timestamp() < cutoff_time:
-                    client.delete_object(Bucket=self.config.S3_BUCKET_NAME, Key=obj['Key'])
-                    cleaned_count += 1
-
-            return cleaned_count
+                    batch.append({'Key': obj['Key']})
+                    if len(batch) == self.DELETE_BATCH_SIZE:
+                        futures.append(self._delete_executor.submit(self._delete_batch, client, batch))
+                        batch = []
+            if batch:
+                futures.append(self._delete_executor.submit(self._delete_batch, client, batch))
+
+            return sum(future.result() for future in futures)
         except Exception as e:
             logger.error(f"Error cleaning up S3 files in {segment}: {e}")
             return 0
@@ -338,14 +627,7 @@ class SupabaseStorageBackend(StorageBackend):
         return self._supabase_client
 
     def _get_file_path(self, segment: str, filename: str) -> str:
-        if segment not in self.config.SEGMENTS:
-            raise ValueError(f"Invalid segment: {segment}")
-
-        safe_filename = os.path.basename(filename)
-        if not safe_filename or safe_filename in ['.', '..']:
-            raise ValueError("Invalid filename")
-
-        return f"{segment}/{safe_filename}"
+        return f"{segment}/{_safe_filename(self.config, segment, filename)}"
 
     def save_file(self, segment: str, filename: str, content: bytes, content_type: str = "application/octet-stream") -> str:
         file_path = self._get_file_path(segment, filename)
@@ -367,8 +649,7 @@ class SupabaseStorageBackend(StorageBackend):
         return self.save_file(segment, filename, content.encode('utf-8'), "text/plain")
 
     def save_json(self, segment: str, filename: str, data: Dict[str, Any]) -> str:
-        content = json.dumps(data, ensure_ascii=False, indent=2)
-        return self.save_file(segment, filename, content.encode('utf-8'), "application/json")
+        return self.save_file(segment, filename, _dumps_json(data), "application/json")
 
     def get_file(self, segment: str, filename: str) -> Optional[bytes]:
         try:
@@ -394,16 +675,16 @@ class SupabaseStorageBackend(StorageBackend):
 
     def get_json(self, segment: str, filename: str) -> Optional[Dict[str, Any]]:
         try:
-            text = self.get_text(segment, filename)
-            if text:
-                return json.loads(text)
+            raw = self.get_file(segment, filename)
+            if raw:
+                return _loads_json(raw)
         except Exception as e:
             logger.error(f"Error reading JSON from Supabase {segment}/{filename}: {e}")
         return None
 
     def list_files(self, segment: str) -> List[str]:
         try:
-            if segment not in self.config.SEGMENTS:
+            if segment not in self.config.SEGMENTS_SET:
                 return []
 
             client = self._get_supabase_client()
@@ -438,6 +719,136 @@ class SupabaseStorageBackend(StorageBackend):
         logger.warning("Cleanup not implemented for Supabase backend")
         return 0
 
+class HybridStorageBackend(StorageBackend):
+    """Local storage for small files with asynchronous S3 mirroring; large files go straight to S3"""
+
+    def __init__(self, config: StorageConfig):
+        self.config = config
+        self.local = LocalStorageBackend(config)
+        self.s3 = S3StorageBackend(config)
+        self._mirror_queue: "queue.Queue" = queue.Queue()
+        self._mirror_thread: Optional[threading.Thread] = None
+        self._mirror_lock = threading.Lock()
+
+        # (segment, filename) -> generation of its newest queued mirror; older
+        # queue entries for the key are superseded and skipped by the worker
+        self._generations: Dict[tuple, int] = {}
+        self._next_generation = itertools.count()
+        self._uploading: set = set()
+        self._mirror_cond = threading.Condition()
+
+    def _start_mirror_worker(self):
+        with self._mirror_lock:
+            if self._mirror_thread is None or not self._mirror_thread.is_alive():
+                self._mirror_thread = threading.Thread(target=self._mirror_worker, name="s3-mirror", daemon=True)
+                self._mirror_thread.start()
+
+    def _mirror_worker(self):
+        while True:
+            segment, filename, content, content_type, generation = self._mirror_queue.get()
+            key = (segment, filename)
+            try:
+                with self._mirror_cond:
+                    if self._generations.get(key) != generation:
+                        continue
+                    self._uploading.add(key)
+                try:
+                    self.s3.save_file(segment, filename, content, content_type)
+                except Exception as e:
+                    logger.error(f"Error mirroring {segment}/{filename} to S3: {e}")
+                finally:
+                    with self._mirror_cond:
+                        self._uploading.discard(key)
+                        if self._generations.get(key) == generation:
+                            del self._generations[key]
+                        self._mirror_cond.notify_all()
+            finally:
+                self._mirror_queue.task_done()
+
+    def _supersede_mirror(self, segment: str, filename: str):
+        """Cancel queued mirrors of a file and wait out one already uploading"""
+        key = (segment, filename)
+        with self._mirror_cond:
+            self._generations.pop(key, None)
+            while key in self._uploading:
+                self._mirror_cond.wait()
+
+    def flush(self):
+        self._mirror_queue.join()
+
+    def save_file(self, segment: str, filename: str, content: bytes, content_type: str = "application/octet-stream") -> str:
+        if len(content) < self.config.HYBRID_LOCAL_MAX_BYTES:
+            path = self.local.save_file(segment, filename, content, content_type)
+            with self._mirror_cond:
+                generation = next(self._next_generation)
+                self._generations[(segment, filename)] = generation
+            self._start_mirror_worker()
+            self._mirror_queue.put((segment, filename, content, content_type, generation))
+            return path
+
+        # Large payloads aren't kept locally; drop any older local copy that would shadow S3
+        self._supersede_mirror(segment, filename)
+        self.local.delete_file(segment, filename)
+        return self.s3.save_file(segment, filename, content, content_type)
+
+    def save_text(self, segment: str, filename: str, content: str) -> str:
+        return self.save_file(segment, filename, content.encode('utf-8'), "text/plain")
+
+    def save_json(self, segment: str, filename: str, data: Dict[str, Any]) -> str:
+        return self.save_file(segment, filename, _dumps_json(data), "application/json")
+
+    def get_file(self, segment: str, filename: str) -> Optional[bytes]:
+        content = self.local.get_file(segment, filename)
+        if content is None:
+            content = self.s3.get_file(segment, filename)
+        return content
+
+    def read_file(self, segment: str, filename: str) -> Optional[bytes]:
+        content = self.local.read_file(segment, filename)
+        if content is None:
+            content = self.s3.read_file(segment, filename)
+        return content
+
+    def get_text(self, segment: str, filename: str) -> Optional[str]:
+        try:
+            content = self.get_file(segment, filename)
+            if content is not None:
+                return content.decode('utf-8')
+        except Exception as e:
+            logger.error(f"Error reading text file {segment}/{filename}: {e}")
+        return None
+
+    def get_json(self, segment: str, filename: str) -> Optional[Dict[str, Any]]:
+        try:
+            raw = self.get_file(segment, filename)
+            if raw:
+                return _loads_json(raw)
+        except Exception as e:
+            logger.error(f"Error reading JSON file {segment}/{filename}: {e}")
+        return None
+
+    def get_fileview(self, segment: str, filename: str) -> Optional[memoryview]:
+        view = self.local.get_fileview(segment, filename)
+        if view is None:
+            view = self.s3.get_fileview(segment, filename)
+        return view
+
+    def list_files(self, segment: str) -> List[str]:
+        # Mirrors may still be in flight, so include local-only files
+        return list(dict.fromkeys(self.local.list_files(segment) + self.s3.list_files(segment)))
+
+    def delete_file(self, segment: str, filename: str) -> bool:
+        # A pending mirror would otherwise re-create the object after the delete
+        self._supersede_mirror(segment, filename)
+        deleted_local = self.local.delete_file(segment, filename)
+        deleted_s3 = self.s3.delete_file(segment, filename)
+        return deleted_local or deleted_s3
+
+    def cleanup_old_files(self, segment: str, max_age_days: int) -> int:
+        self.local.cleanup_old_files(segment, max_age_days)
+        # Every file ends up in S3, so its count is the authoritative one
+        return self.s3.cleanup_old_files(segment, max_age_days)
+
 class StorageManager:
     """Main storage manager with multi-backend support"""
 
@@ -445,6 +856,23 @@ class StorageManager:
         self.config = StorageConfig()
         self.backend = self._create_backend()
 
+        # (backend, segment) -> (cached_at, {stored filename: None}), least recently used first
+        self._list_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._list_cache_lock = threading.Lock()
+
+        # (segment, filename) -> time of the last lookup that found nothing, oldest first
+        self._missing: "OrderedDict[tuple, float]" = OrderedDict()
+        self._missing_lock = threading.Lock()
+
+        # (segment, filename) -> whether this process last stored it compressed
+        self._variants: "OrderedDict[tuple, bool]" = OrderedDict()
+        self._variants_lock = threading.Lock()
+
+        self._compress = self.config.COMPRESSION == "zstd"
+        if self._compress and not ZSTD_AVAILABLE:
+            logger.warning("STORAGE_COMPRESSION=zstd requires zstandard; storing files uncompressed")
+            self._compress = False
+
     def _create_backend(self) -> StorageBackend:
         """Create the appropriate storage backend"""
         backend_type = self.config.STORAGE_BACKEND.lower()
@@ -455,43 +883,299 @@ class StorageManager:
             return S3StorageBackend(self.config)
         elif backend_type == "supabase":
             return SupabaseStorageBackend(self.config)
+        elif backend_type == "hybrid":
+            return HybridStorageBackend(self.config)
         else:
             logger.warning(f"Unknown storage backend '{backend_type}', falling back to local")
             return LocalStorageBackend(self.config)
 
+    def _invalidate_listing(self, segment: str):
+        """Drop the cached listing of a segment after it changes"""
+        with self._list_cache_lock:
+            self._list_cache.pop((self.config.STORAGE_BACKEND, segment), None)
+
+    def _update_listing(self, segment: str, added: Optional[str] = None, removed: Optional[str] = None):
+        """Apply our own write or delete to a cached listing rather than dropping it"""
+        # Backends store the sanitized name, so that is what their listings contain
+        try:
+            if added:
+                added = _safe_filename(self.config, segment, added)
+            if removed:
+                removed = _safe_filename(self.config, segment, removed)
+        except ValueError:
+            return
+        with self._list_cache_lock:
+            cached = self._list_cache.get((self.config.STORAGE_BACKEND, segment))
+            if cached is None:
+                return
+            names = cached[1]
+            if removed:
+                names.pop(removed, None)
+            if added:
+                names[added] = None
+
+    def _listing(self, segment: str) -> Dict[str, None]:
+        """Stored filenames of a segment, cached for LIST_CACHE_TTL; read the result under _list_cache_lock"""
+        key = (self.config.STORAGE_BACKEND, segment)
+        now = time.monotonic()
+
+        with self._list_cache_lock:
+            cached = self._list_cache.get(key)
+            if cached is not None and now - cached[0] < self.config.LIST_CACHE_TTL:
+                self._list_cache.move_to_end(key)
+                return cached[1]
+
+        names = dict.fromkeys(self.backend.list_files(segment))
+
+        with self._list_cache_lock:
+            self._list_cache[key] = (now, names)
+            self._list_cache.move_to_end(key)
+            if len(self._list_cache) > self.config.LIST_CACHE_MAX_ENTRIES:
+                self._list_cache.popitem(last=False)
+
+        return names
+
+    def _known_missing(self, segment: str, filename: str) -> bool:
+        """True if a recent lookup of this file found nothing"""
+        with self._missing_lock:
+            missed_at = self._missing.get((segment, filename))
+            if missed_at is None:
+                return False
+            if time.monotonic() - missed_at < self.config.NEGATIVE_CACHE_TTL:
+                return True
+            del self._missing[(segment, filename)]
+            return False
+
+    def _record_missing(self, segment: str, filename: str):
+        with self._missing_lock:
+            self._missing.pop((segment, filename), None)
+            self._missing[(segment, filename)] = time.monotonic()
+            if len(self._missing) > self.config.NEGATIVE_CACHE_MAX_ENTRIES:
+                self._missing.popitem(last=False)
+
+    def _forget_missing(self, segment: str, filename: str):
+        with self._missing_lock:
+            self._missing.pop((segment, filename), None)
+
+    def _should_compress(self, content: bytes, content_type: str) -> bool:
+        return (self._compress and len(content) >= self.config.COMPRESS_MIN_BYTES
+                and (content_type.startswith("text/") or content_type == "application/json"))
+
+    def _stored_variant(self, segment: str, filename: str) -> Optional[bool]:
+        """True if a file is stored under its .zst name, False if under its plain name, None if neither is known"""
+        key = (segment, filename)
+        with self._variants_lock:
+            compressed = self._variants.get(key)
+            if compressed is not None:
+                self._variants.move_to_end(key)
+                return compressed
+
+        try:
+            names = self._listing(segment)
+            compressed_name = _safe_filename(self.config, segment, filename + self.config.COMPRESSED_SUFFIX)
+            plain_name = _safe_filename(self.config, segment, filename)
+        except ValueError:
+            return None
+        with self._list_cache_lock:
+            if compressed_name in names:
+                return True
+            if plain_name in names:
+                return False
+        return None
+
+    def _remember_variant(self, segment: str, filename: str, compressed: Optional[bool]):
+        key = (segment, filename)
+        with self._variants_lock:
+            self._variants.pop(key, None)
+            if compressed is not None:
+                self._variants[key] = compressed
+                if len(self._variants) > self.config.VARIANT_CACHE_MAX_ENTRIES:
+                    self._variants.popitem(last=False)
+
+    def _save_maybe_compressed(self, segment: str, filename: str, content: bytes, content_type: str) -> str:
+        """Store content, zstd-compressing large text under a .zst name"""
+        compressed_name = filename + self.config.COMPRESSED_SUFFIX
+        previous = self._stored_variant(segment, filename)
+        compress = self._should_compress(content, content_type)
+        if compress:
+            # Compressor objects aren't thread-safe, so use one per call
+            content = zstandard.ZstdCompressor(level=3).compress(content)
+            stored_name, other_name = compressed_name, filename
+        else:
+            stored_name, other_name = filename, compressed_name
+        result = self.backend.save_file(segment, stored_name, content, content_type)
+        self._update_listing(segment, added=stored_name)
+
+        # Drop the other variant, when there is one, so an older copy can't shadow this one
+        if previous is not None and previous != compress:
+            self.backend.delete_file(segment, other_name)
+            self._update_listing(segment, removed=other_name)
+        self._remember_variant(segment, filename, compress)
+        return result
+
+    def _decompress(self, segment: str, filename: str, content: bytes) -> bytes:
+        # A .zst name alone doesn't mean we compressed it, e.g. an upload named x.txt.zst
+        if not content.startswith(ZSTD_FRAME_MAGIC):
+            return content
+        try:
+            return zstandard.ZstdDecompressor().decompress(content)
+        except zstandard.ZstdError as e:
+            raise StorageReadError(f"Error decompressing {segment}/{filename}: {e}") from e
+
+    def _get_maybe_compressed(self, segment: str, filename: str) -> Optional[bytes]:
+        compressed_name = filename + self.config.COMPRESSED_SUFFIX
+        variant = self._stored_variant(segment, filename)
+        if variant:
+            content = self.backend.read_file(segment, compressed_name)
+            if content is not None:
+                return self._decompress(segment, compressed_name, content)
+
+        content = self.backend.read_file(segment, filename)
+        if content is None and variant is None:
+            # Another process may have stored it compressed since our listing was cached
+            content = self.backend.read_file(segment, compressed_name)
+            if content is not None:
+                self._remember_variant(segment, filename, True)
+                return self._decompress(segment, compressed_name, content)
+        return content
+
     def save_file(self, segment: str, filename: str, content: bytes, content_type: str = "application/octet-stream") -> str:
-        return self.backend.save_file(segment, filename, content, content_type)
+        if self._compress:
+            result = self._save_maybe_compressed(segment, filename, content, content_type)
+        else:
+            result = self.backend.save_file(segment, filename, content, content_type)
+            self._update_listing(segment, added=filename)
+        self._forget_missing(segment, filename)
+        return result
 
     def save_text(self, segment: str, filename: str, content: str) -> str:
-        return self.backend.save_text(segment, filename, content)
+        if self._compress:
+            result = self._save_maybe_compressed(segment, filename, content.encode("utf-8"), "text/plain")
+        else:
+            result = self.backend.save_text(segment, filename, content)
+            self._update_listing(segment, added=filename)
+        self._forget_missing(segment, filename)
+        return result
 
     def save_json(self, segment: str, filename: str, data: Dict[str, Any]) -> str:
-        return self.backend.save_json(segment, filename, data)
+        if self._compress:
+            result = self._save_maybe_compressed(segment, filename, _dumps_json(data), "application/json")
+        else:
+            result = self.backend.save_json(segment, filename, data)
+            self._update_listing(segment, added=filename)
+        self._forget_missing(segment, filename)
+        return result
+
+    def flush(self):
+        """Wait for background writes to finish (call on shutdown)"""
+        self.backend.flush()
+
+    def _read(self, segment: str, filename: str) -> Optional[bytes]:
+        """Read through the negative cache; only a confirmed "not found" is remembered"""
+        if self._known_missing(segment, filename):
+            return None
+        try:
+            if self._compress:
+                content = self._get_maybe_compressed(segment, filename)
+            else:
+                content = self.backend.read_file(segment, filename)
+        except StorageReadError as e:
+            # Transient failures must not hide the file for NEGATIVE_CACHE_TTL
+            logger.error(str(e))
+            return None
+        if content is None:
+            self._record_missing(segment, filename)
+        return content
 
     def get_file(self, segment: str, filename: str) -> Optional[bytes]:
-        return self.backend.get_file(segment, filename)
+        return self._read(segment, filename)
 
     def get_text(self, segment: str, filename: str) -> Optional[str]:
+        if self._compress:
+            content = self._read(segment, filename)
+            return content.decode("utf-8") if content else None
+        if self._known_missing(segment, filename):
+            return None
         return self.backend.get_text(segment, filename)
 
     def get_json(self, segment: str, filename: str) -> Optional[Dict[str, Any]]:
+        if self._compress:
+            content = self._read(segment, filename)
+            return _loads_json(content) if content else None
+        if self._known_missing(segment, filename):
+            return None
         return self.backend.get_json(segment, filename)
 
+    def get_fileview(self, segment: str, filename: str) -> Optional[memoryview]:
+        if self._compress:
+            content = self._read(segment, filename)
+            return memoryview(content) if content is not None else None
+        if self._known_missing(segment, filename):
+            return None
+        # get_fileview returns None on errors too, so its misses aren't cached
+        return self.backend.get_fileview(segment, filename)
+
     def list_files(self, segment: str) -> List[str]:
-        return self.backend.list_files(segment)
+        names = self._listing(segment)
+        with self._list_cache_lock:
+            files = list(names)
+        if self._compress:
+            # Report compressed files under the name they were saved with
+            suffix = self.config.COMPRESSED_SUFFIX
+            files = list(dict.fromkeys(name[:-len(suffix)] if name.endswith(suffix) else name for name in files))
+        return files
 
     def delete_file(self, segment: str, filename: str) -> bool:
-        return self.backend.delete_file(segment, filename)
+        if self._compress and self._stored_variant(segment, filename):
+            stored_name = filename + self.config.COMPRESSED_SUFFIX
+        else:
+            stored_name = filename
+        result = self.backend.delete_file(segment, stored_name)
+        self._update_listing(segment, removed=stored_name)
+        self._remember_variant(segment, filename, None)
+        return result
 
     def cleanup_old_files(self, segment: str, max_age_days: int = 30) -> int:
-        return self.backend.cleanup_old_files(segment, max_age_days)
+        result = self.backend.cleanup_old_files(segment, max_age_days)
+        self._invalidate_listing(segment)
+        return result
+
+    # Async variants run the blocking backend call in a worker thread so the
+    # event loop keeps serving other requests during network and disk I/O
+
+    async def save_file_async(self, segment: str, filename: str, content: bytes, content_type: str = "application/octet-stream") -> str:
+        return await asyncio.to_thread(self.save_file, segment, filename, content, content_type)
+
+    async def save_text_async(self, segment: str, filename: str, content: str) -> str:
+        return await asyncio.to_thread(self.save_text, segment, filename, content)
+
+    async def save_json_async(self, segment: str, filename: str, data: Dict[str, Any]) -> str:
+        return await asyncio.to_thread(self.save_json, segment, filename, data)
+
+    async def get_file_async(self, segment: str, filename: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self.get_file, segment, filename)
+
+    async def get_text_async(self, segment: str, filename: str) -> Optional[str]:
+        return await asyncio.to_thread(self.get_text, segment, filename)
+
+    async def get_json_async(self, segment: str, filename: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.get_json, segment, filename)
+
+    async def list_files_async(self, segment: str) -> List[str]:
+        return await asyncio.to_thread(self.list_files, segment)
+
+    async def delete_file_async(self, segment: str, filename: str) -> bool:
+        return await asyncio.to_thread(self.delete_file, segment, filename)
+
+    async def cleanup_old_files_async(self, segment: str, max_age_days: int = 30) -> int:
+        return await asyncio.to_thread(self.cleanup_old_files, segment, max_age_days)
 
     def get_storage_info(self) -> Dict[str, Any]:
         """Get storage backend information"""
         return {
             "backend": self.config.STORAGE_BACKEND,
             "segments": self.config.SEGMENTS,
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": iso_now()
         }
 
 # Global storage manager instance
@@ -6,16 +6,22 @@ Handles batch operations, analytics, and cleanup tasks with retry logic
 
 import asyncio
 import json
+import random
 import time
 from typing import Dict, Any, Optional, Callable
-from datetime import datetime
-import uuid
+import secrets
+from collections import OrderedDict, deque
 from dataclasses import dataclass
 from enum import Enum
 import logging
 
+from .time_utils import iso_now
+
 logger = logging.getLogger(__name__)
 
+class TaskQueueFull(Exception):
+    """Raised when a task cannot be queued before the enqueue timeout"""
+
 class TaskStatus(Enum):
     PENDING = "pending"
     RUNNING = "running"
@@ -23,7 +29,7 @@ class TaskStatus(Enum):
     FAILED = "failed"
     RETRYING = "retrying"
 
-@dataclass
+@dataclass(slots=True)
 class Task:
     id: str
     task_type: str
@@ -36,16 +42,68 @@ class Task:
     max_retries: int = 3
     error: Optional[str] = None
     result: Optional[Dict[str, Any]] = None
+    # Monotonic counterparts of started_at/completed_at, used for all duration math
+    started_monotonic: Optional[float] = None
+    completed_monotonic: Optional[float] = None
+
+    def processing_time(self) -> Optional[float]:
+        if self.started_monotonic is None or self.completed_monotonic is None:
+            return None
+        return self.completed_monotonic - self.started_monotonic
 
 class AsyncTaskQueue:
     """Async task queue for background content moderation processing"""
 
-    def __init__(self, max_concurrent_tasks: int = 3):
-        self.tasks: Dict[str, Task] = {}
-        self.pending_queue = asyncio.Queue()
+    # Items of a batch_moderation task in flight at once
+    BATCH_CONCURRENCY = 16
+
+    # Fixed mock feedback for analytics generation, built once
+    MOCK_FEEDBACK_TEXTS = tuple(f"Feedback {i}" for i in range(50))
+    MOCK_FEEDBACK_RATINGS = tuple((i % 5) + 1 for i in range(50))
+
+    def __init__(self, max_concurrent_tasks: int = 3, max_completed_tasks: int = 10_000,
+                 retry_backoff_cap: float = 60.0, retry_jitter: str = "full",
+                 max_queue_size: int = 10_000, enqueue_timeout: float = 5.0):
+        # Pending/running/retrying tasks; finished tasks move to _completed, which
+        # keeps only the most recent max_completed_tasks so memory stays bounded
+        self.active_tasks: Dict[str, Task] = {}
+        self._completed: "OrderedDict[str, Task]" = OrderedDict()
+        self._max_completed = max_completed_tasks
+        # Running totals over the retained tasks, so get_queue_stats doesn't rescan them
+        self._status_counts: Dict[TaskStatus, int] = {status: 0 for status in TaskStatus}
+        self._completed_time_total = 0.0
+        # Task ids waiting for a worker; workers sleep on _has_work while it is empty
+        self._pending = deque()
+        self._has_work = asyncio.Event()
+        # add_task waits (up to enqueue_timeout) on _has_space while max_queue_size ids are pending
+        self.max_queue_size = max_queue_size
+        self.enqueue_timeout = enqueue_timeout
+        self._has_space = asyncio.Event()
+        self._has_space.set()
         self.max_concurrent_tasks = max_concurrent_tasks
-        self.running_tasks = set()
+        self._running_count = 0
         self.workers_started = False
+        # Retry delays grow as 2 ** attempt up to the cap; "full" jitter picks a uniform
+        # delay below that so retries of a shared failure don't all land together
+        self.retry_backoff_cap = retry_backoff_cap
+        self.retry_jitter = retry_jitter
+        # Per-task-type dispatch for processing and progress estimates
+        self._handlers: Dict[str, Callable] = {
+            "batch_moderation": self._process_batch_moderation,
+            "analytics_generation": self._process_analytics_generation,
+            "cleanup_operation": self._process_cleanup_operation,
+            "sentiment_analysis": self._process_sentiment_analysis,
+            "feedback_processing": self._process_feedback_processing,
+        }
+        self._progress_fns: Dict[str, Callable[[Task], float]] = {
+            "batch_moderation": self._progress_batch,
+            "analytics_generation": self._progress_analytics,
+            "cleanup_operation": self._progress_cleanup,
+        }
+        # Service singletons, imported on first use to avoid circular imports
+        self._moderation_agent = None
+        self._sentiment_analyzer = None
+        self._storage_manager = None
 
     async def start_workers(self):
         """Start background worker tasks"""
@@ -57,8 +115,14 @@ class AsyncTaskQueue:
             asyncio.create_task(self._worker(f"moderation_worker_{i}"))
 
     async def add_task(self, task_type: str, payload: Dict[str, Any], max_retries: int = 3) -> str:
-        """Add a task to the queue"""
-        task_id = f"{task_type}_{uuid.uuid4().hex[:8]}"
+        """Add a task to the queue, raising TaskQueueFull if it stays full past enqueue_timeout"""
+        if len(self._pending) >= self.max_queue_size:
+            try:
+                await asyncio.wait_for(self._wait_for_space(), timeout=self.enqueue_timeout)
+            except asyncio.TimeoutError:
+                raise TaskQueueFull(f"Task queue is full ({self.max_queue_size} pending tasks)")
+
+        task_id = f"{task_type}_{secrets.token_hex(4)}"
 
         task = Task(
             id=task_id,
@@ -69,16 +133,70 @@ class AsyncTaskQueue:
             max_retries=max_retries
         )
 
-        self.tasks[task_id] = task
-        await self.pending_queue.put(task_id)
+        self.active_tasks[task_id] = task
+        self._status_counts[TaskStatus.PENDING] += 1
+        self._enqueue(task_id)
 
         logger.info(f"Task {task_id} added to queue: {task_type}")
 
         return task_id
 
+    def _get_task(self, task_id: str) -> Optional[Task]:
+        task = self.active_tasks.get(task_id)
+        if task is None:
+            task = self._completed.get(task_id)
+        return task
+
+    def _set_status(self, task: Task, status: TaskStatus):
+        self._status_counts[task.status] -= 1
+        self._status_counts[status] += 1
+        task.status = status
+
+    def _finish(self, task: Task, status: TaskStatus):
+        """Mark a task completed or failed and move it to the bounded completed store"""
+        self._set_status(task, status)
+        task.completed_at = time.time()
+        task.completed_monotonic = time.monotonic()
+        self.active_tasks.pop(task.id, None)
+        self._completed[task.id] = task
+        if status == TaskStatus.COMPLETED and task.started_monotonic is not None:
+            self._completed_time_total += task.processing_time()
+
+        while len(self._completed) > self._max_completed:
+            self._forget(self._completed.popitem(last=False)[1])
+
+    def _forget(self, task: Task):
+        """Drop a finished task's contribution to the running stats"""
+        self._status_counts[task.status] -= 1
+        if task.status == TaskStatus.COMPLETED and task.started_monotonic is not None:
+            self._completed_time_total -= task.processing_time()
+
+    def _retry_delay(self, retry_count: int) -> float:
+        backoff = min(2 ** retry_count, self.retry_backoff_cap)
+        if self.retry_jitter == "full":
+            return random.uniform(0, backoff)
+        return backoff
+
+    def _enqueue(self, task_id: str):
+        self._pending.append(task_id)
+        self._has_work.set()
+
+    async def _next_task_id(self) -> str:
+        while not self._pending:
+            self._has_work.clear()
+            await self._has_work.wait()
+        task_id = self._pending.popleft()
+        self._has_space.set()
+        return task_id
+
+    async def _wait_for_space(self):
+        while len(self._pending) >= self.max_queue_size:
+            self._has_space.clear()
+            await self._has_space.wait()
+
     async def get_task_status(self, task_id: str) -> Optional[Dict[str, Any]]:
         """Get task status and result"""
-        task = self.tasks.get(task_id)
+        task = self._get_task(task_id)
         if not task:
             return None
 
@@ -104,34 +222,43 @@ class AsyncTaskQueue:
             return 0.0
         elif task.status == TaskStatus.RUNNING:
             # Estimate progress based on task type and elapsed time
-            if task.started_at:
-                elapsed = time.time() - task.started_at
-                if task.task_type == "batch_moderation":
-                    # Batch moderation: estimate based on item count
-                    total_items = task.payload.get("total_items", 1)
-                    return min(0.9, elapsed / (total_items * 0.1))  # Rough estimate
-                elif task.task_type == "analytics_generation":
-                    return min(0.9, elapsed / 30.0)  # 30 seconds estimate
-                elif task.task_type == "cleanup_operation":
-                    return min(0.9, elapsed / 60.0)  # 1 minute estimate
+            progress_fn = self._progress_fns.get(task.task_type)
+            if task.started_monotonic is not None and progress_fn:
+                return progress_fn(task)
             return 0.5  # Default mid-progress
         return 0.0
 
+    @staticmethod
+    def _progress_batch(task: Task) -> float:
+        # Batch moderation: fraction of items already moderated
+        done = task.payload.get("_progress_done", 0)
+        total_items = task.payload.get("total_items") or len(task.payload.get("contents", [])) or 1
+        return done / total_items
+
+    @staticmethod
+    def _progress_analytics(task: Task) -> float:
+        return min(0.9, (time.monotonic() - task.started_monotonic) / 30.0)  # 30 seconds estimate
+
+    @staticmethod
+    def _progress_cleanup(task: Task) -> float:
+        return min(0.9, (time.monotonic() - task.started_monotonic) / 60.0)  # 1 minute estimate
+
     async def _worker(self, worker_name: str):
         """Background worker to process tasks"""
         while True:
             try:
                 # Get next task from queue
-                task_id = await self.pending_queue.get()
-                task = self.tasks.get(task_id)
+                task_id = await self._next_task_id()
+                task = self.active_tasks.get(task_id)
 
-                if not task or task.status != TaskStatus.PENDING:
+                if not task or task.status not in (TaskStatus.PENDING, TaskStatus.RETRYING):
                     continue
 
                 # Mark task as running
-                task.status = TaskStatus.RUNNING
+                self._set_status(task, TaskStatus.RUNNING)
                 task.started_at = time.time()
-                self.running_tasks.add(task_id)
+                task.started_monotonic = time.monotonic()
+                self._running_count += 1
 
                 logger.info(f"Worker {worker_name} started task {task_id}")
 
@@ -140,9 +267,8 @@ class AsyncTaskQueue:
                     result = await self._process_task(task)
 
                     # Mark as completed
-                    task.status = TaskStatus.COMPLETED
-                    task.completed_at = time.time()
                     task.result = result
+                    self._finish(task, TaskStatus.COMPLETED)
 
                     logger.info(f"Task {task_id} completed by {worker_name}")
 
@@ -153,79 +279,92 @@ class AsyncTaskQueue:
                     if task.retry_count < task.max_retries:
                         # Retry the task
                         task.retry_count += 1
-                        task.status = TaskStatus.RETRYING
+                        self._set_status(task, TaskStatus.RETRYING)
 
                         # Add back to queue with delay
-                        await asyncio.sleep(2 ** task.retry_count)  # Exponential backoff
-                        await self.pending_queue.put(task_id)
+                        await asyncio.sleep(self._retry_delay(task.retry_count))  # Jittered exponential backoff
+                        self._enqueue(task_id)
 
                         logger.warning(f"Task {task_id} retrying (attempt {task.retry_count})")
                     else:
                         # Max retries exceeded
-                        task.status = TaskStatus.FAILED
-                        task.completed_at = time.time()
+                        self._finish(task, TaskStatus.FAILED)
 
                         logger.error(f"Task {task_id} failed permanently")
 
                 finally:
-                    self.running_tasks.discard(task_id)
+                    self._running_count -= 1
 
             except Exception as e:
                 logger.error(f"Worker {worker_name} error: {e}")
                 await asyncio.sleep(1)
 
+    def _get_moderation_agent(self):
+        if self._moderation_agent is None:
+            from .moderation_agent import moderation_agent
+            self._moderation_agent = moderation_agent
+        return self._moderation_agent
+
+    def _get_sentiment_analyzer(self):
+        if self._sentiment_analyzer is None:
+            from .sentiment_analyzer import sentiment_analyzer
+            self._sentiment_analyzer = sentiment_analyzer
+        return self._sentiment_analyzer
+
+    def _get_storage_manager(self):
+        if self._storage_manager is None:
+            from .storage import storage_manager
+            self._storage_manager = storage_manager
+        return self._storage_manager
+
     async def _process_task(self, task: Task) -> Dict[str, Any]:
         """Process a specific task based on its type"""
-        task_type = task.task_type
-
-        if task_type == "batch_moderation":
-            return await self._process_batch_moderation(task.payload)
-        elif task_type == "analytics_generation":
-            return await self._process_analytics_generation(task.payload)
-        elif task_type == "cleanup_operation":
-            return await self._process_cleanup_operation(task.payload)
-        elif task_type == "sentiment_analysis":
-            return await self._process_sentiment_analysis(task.payload)
-        elif task_type == "feedback_processing":
-            return await self._process_feedback_processing(task.payload)
-        else:
-            raise ValueError(f"Unknown task type: {task_type}")
+        handler = self._handlers.get(task.task_type)
+        if handler is None:
+            raise ValueError(f"Unknown task type: {task.task_type}")
+        return await handler(task.payload)
 
     async def _process_batch_moderation(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         """Process batch content moderation"""
-        from .moderation_agent import moderation_agent
+        moderation_agent = self._get_moderation_agent()
 
         contents = payload.get("contents", [])
         content_type = payload.get("content_type", "text")
         metadata = payload.get("metadata", {})
 
-        results = []
-        total_processed = 0
-        total_flagged = 0
+        # Items of one batch are moderated concurrently, at most BATCH_CONCURRENCY at a time
+        semaphore = asyncio.Semaphore(self.BATCH_CONCURRENCY)
+        payload["_progress_done"] = 0
 
-        for i, content in enumerate(contents):
-            try:
-                # Update task progress (simulate)
-                await asyncio.sleep(0.01)  # Small delay for progress tracking
+        async def moderate_one(i: int, content: str) -> Dict[str, Any]:
+            preview = content if len(content) <= 100 else content[:100] + "..."
+            async with semaphore:
+                try:
+                    result = await moderation_agent.moderate(content, content_type, metadata)
+                    return {
+                        "content_index": i,
+                        "content": preview,
+                        "result": result
+                    }
+                except Exception as e:
+                    return {
+                        "content_index": i,
+                        "error": str(e),
+                        "content": preview
+                    }
+                finally:
+                    payload["_progress_done"] += 1
 
-                result = await moderation_agent.moderate(content, content_type, metadata)
-                results.append({
-                    "content_index": i,
-                    "content": content[:100] + "..." if len(content) > 100 else content,
-                    "result": result
-                })
+        results = list(await asyncio.gather(*(moderate_one(i, content) for i, content in enumerate(contents))))
 
+        total_processed = 0
+        total_flagged = 0
+        for item in results:
+            if "result" in item:
                 total_processed += 1
-                if result.get("flagged", False):
+                if item["result"].get("flagged", False):
                     total_flagged += 1
 
-            except Exception as e:
-                results.append({
-                    "content_index": i,
-                    "error": str(e),
-                    "content": content[:100] + "..." if len(content) > 100 else content
-                })
-
         return {
             "total_items": len(contents),
             "processed": total_processed,
@@ -236,21 +375,15 @@ class AsyncTaskQueue:
 
     async def _process_analytics_generation(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         """Generate analytics data"""
-        from .sentiment_analyzer import sentiment_analyzer
+        sentiment_analyzer = self._get_sentiment_analyzer()
 
         # Generate mock analytics - in real implementation, query actual data
         await asyncio.sleep(2)  # Simulate processing time
 
         # Generate sentiment analysis for recent content
-        mock_feedbacks = [
-            {"text": f"Feedback {i}", "rating": (i % 5) + 1}
-            for i in range(50)
-        ]
-
-        texts = [fb["text"] for fb in mock_feedbacks]
-        ratings = [fb["rating"] for fb in mock_feedbacks]
-
-        sentiment_results = sentiment_analyzer.analyze_batch(texts, ratings, "analytics")
+        sentiment_results = sentiment_analyzer.analyze_batch(
+            self.MOCK_FEEDBACK_TEXTS, self.MOCK_FEEDBACK_RATINGS, "analytics"
+        )
         sentiment_summary = sentiment_analyzer.get_sentiment_summary(sentiment_results)
 
         return {
@@ -258,12 +391,12 @@ class AsyncTaskQueue:
             "time_range": payload.get("time_range", "24h"),
             "sentiment_analysis": sentiment_summary,
             "total_feedbacks_analyzed": len(sentiment_results),
-            "generated_at": datetime.utcnow().isoformat()
+            "generated_at": iso_now()
         }
 
     async def _process_cleanup_operation(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         """Process cleanup operations"""
-        from .storage import storage_manager
+        storage_manager = self._get_storage_manager()
 
         operation_type = payload.get("operation_type", "temp_files")
         max_age_days = payload.get("max_age_days", 30)
@@ -275,19 +408,19 @@ class AsyncTaskQueue:
         else:
             segment = "temp"
 
-        cleaned_count = storage_manager.cleanup_old_files(segment, max_age_days)
+        cleaned_count = await storage_manager.cleanup_old_files_async(segment, max_age_days)
 
         return {
             "operation_type": operation_type,
             "segment": segment,
             "max_age_days": max_age_days,
             "files_cleaned": cleaned_count,
-            "cleanup_time": datetime.utcnow().isoformat()
+            "cleanup_time": iso_now()
         }
 
     async def _process_sentiment_analysis(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         """Process sentiment analysis for content"""
-        from .sentiment_analyzer import sentiment_analyzer
+        sentiment_analyzer = self._get_sentiment_analyzer()
 
         texts = payload.get("texts", [])
         ratings = payload.get("ratings")
@@ -306,7 +439,7 @@ class AsyncTaskQueue:
 
     async def _process_feedback_processing(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         """Process user feedback for RL learning"""
-        from .moderation_agent import moderation_agent
+        moderation_agent = self._get_moderation_agent()
 
         moderation_id = payload.get("moderation_id")
         reward = payload.get("reward", 0.0)
@@ -323,53 +456,57 @@ class AsyncTaskQueue:
 
     def get_queue_stats(self) -> Dict[str, Any]:
         """Get queue statistics"""
-        status_counts = {}
-        for task in self.tasks.values():
-            status = task.status.value
-            status_counts[status] = status_counts.get(status, 0) + 1
+        status_counts = {status.value: count for status, count in self._status_counts.items() if count}
 
         # Calculate average processing times
-        completed_tasks = [t for t in self.tasks.values() if t.status == TaskStatus.COMPLETED]
+        completed_count = self._status_counts[TaskStatus.COMPLETED]
         avg_processing_time = 0.0
-        if completed_tasks:
-            total_time = sum((t.completed_at - t.started_at) for t in completed_tasks if t.started_at and t.completed_at)
-            avg_processing_time = total_time / len(completed_tasks)
+        if completed_count:
+            avg_processing_time = self._completed_time_total / completed_count
+
+        total_tasks = len(self.active_tasks) + len(self._completed)
 
         return {
-            "total_tasks": len(self.tasks),
+            "total_tasks": total_tasks,
             "status_breakdown": status_counts,
-            "pending_queue_size": self.pending_queue.qsize(),
-            "running_tasks": len(self.running_tasks),
+            "pending_queue_size": len(self._pending),
+            "running_tasks": self._running_count,
             "workers_started": self.workers_started,
             "max_concurrent_tasks": self.max_concurrent_tasks,
             "avg_processing_time_seconds": round(avg_processing_time, 2),
-            "success_rate": len(completed_tasks) / len(self.tasks) if self.tasks else 0.0
+            "success_rate": completed_count / total_tasks if total_tasks else 0.0
         }
 
     async def cancel_task(self, task_id: str) -> bool:
         """Cancel a pending task"""
-        task = self.tasks.get(task_id)
+        task = self.active_tasks.get(task_id)
         if task and task.status == TaskStatus.PENDING:
-            task.status = TaskStatus.FAILED
             task.error = "Task cancelled by user"
-            task.completed_at = time.time()
+            self._finish(task, TaskStatus.FAILED)
+            # Free its queue slot now rather than when a worker would have popped it
+            try:
+                self._pending.remove(task_id)
+            except ValueError:
+                pass
+            else:
+                self._has_space.set()
             return True
         return False
 
     def cleanup_completed_tasks(self, max_age_hours: int = 24):
         """Clean up old completed tasks from memory"""
         cutoff_time = time.time() - (max_age_hours * 3600)
-        tasks_to_remove = []
-
-        for task_id, task in self.tasks.items():
-            if task.status in [TaskStatus.COMPLETED, TaskStatus.FAILED]:
-                if task.completed_at and task.completed_at < cutoff_time:
-                    tasks_to_remove.append(task_id)
+        removed = 0
 
-        for task_id in tasks_to_remove:
-            del self.tasks[task_id]
+        # _completed is in completion order, so stop at the first task young enough to keep
+        while self._completed:
+            task = next(iter(self._completed.values()))
+            if task.completed_at >= cutoff_time:
+                break
+            self._forget(self._completed.popitem(last=False)[1])
+            removed += 1
 
-        return len(tasks_to_remove)
+        return removed
 
 # Global task queue instance
 task_queue = AsyncTaskQueue(max_concurrent_tasks=3)
\ No newline at end of file
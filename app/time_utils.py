@@ -0,0 +1,18 @@
+"""
+Shared timestamp helpers
+"""
+
+import time
+
+# (epoch second, ISO string) for the most recently formatted second
+_iso_cache = (0, "")
+
+def iso_now() -> str:
+    """Current UTC time as an ISO-8601 string, cached at one-second resolution"""
+    global _iso_cache
+    now = int(time.time())
+    cached_second, cached_iso = _iso_cache
+    if cached_second != now:
+        cached_iso = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(now))
+        _iso_cache = (now, cached_iso)
+    return cached_iso
@@ -13,9 +13,45 @@ Author: Content Moderation System
 Version: 1.0.0
 """
 
+from collections import Counter
 from typing import Dict, List, Set, Tuple
 import re
 
+# Optional Aho-Corasick automaton (pyahocorasick) for the flagged-word scan
+AHOCORASICK_AVAILABLE = False
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    pass
+
+
+def _trie_regex(words: List[str]) -> str:
+    """
+    Regex source matching any of the words, factored into a prefix trie
+
+    Shared prefixes are tested once instead of once per word, and greedy optional
+    suffixes make the longest word win, like a longest-first alternation.
+    """
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        is_word_end = '' in node
+        if len(branches) == 1 and not is_word_end:
+            return branches[0]
+        body = "(?:" + "|".join(branches) + ")"
+        return body + "?" if is_word_end else body
+
+    return build(trie)
+
 
 class FlaggedWordsDatabase:
     """Database containing all flagged words and phrases for content moderation"""
@@ -33,6 +69,12 @@ class FlaggedWordsDatabase:
         # Combine all categories
         self.all_flagged_words = self._combine_all_categories()
 
+        # The word lists never change after init, so the severity views are built once
+        self._critical_words = tuple(word for word, severity in self.all_flagged_words.items()
+                                     if severity == 'critical')
+        self._high_priority_words = tuple(word for word, severity in self.all_flagged_words.items()
+                                          if severity in ('critical', 'high'))
+
         # Severity weights
         self.severity_weights = {
             'critical': 1.0,    # Immediate flagging (score >= 0.8)
@@ -41,6 +83,28 @@ class FlaggedWordsDatabase:
             'low': 0.2          # Low priority flagging (score >= 0.2)
         }
 
+        # Severity of every known word; a 'none' entry in any category wins
+        self._severity_lookup = dict(self.all_flagged_words)
+        for category_dict in self._category_dicts():
+            for word, severity in category_dict.items():
+                if severity == 'none':
+                    self._severity_lookup[word] = 'none'
+
+        # One compiled alternation per category, so check_content scans the
+        # text once instead of doing a substring search per flagged word
+        self._patterns = {
+            category: self._compile_pattern(words)
+            for category, words in self._category_map().items()
+        }
+
+        # With pyahocorasick installed, a native automaton replaces the regex scan
+        self._automatons = {}
+        if AHOCORASICK_AVAILABLE:
+            self._automatons = {
+                category: self._build_automaton(words)
+                for category, words in self._category_map().items()
+            }
+
     def _get_criminal_offenses(self) -> Dict[str, str]:
         """Criminal offenses from BNS 2023 and IPC"""
         return {
@@ -171,9 +235,12 @@ class FlaggedWordsDatabase:
         filtered_combined = {word: severity for word, severity in combined.items() if severity != 'none'}
         return filtered_combined
 
-    def get_flagged_words_by_category(self, category: str) -> Dict[str, str]:
-        """Get flagged words for a specific category"""
-        category_map = {
+    def _category_dicts(self) -> List[Dict[str, str]]:
+        return [self.criminal_offenses, self.hate_speech, self.violence, self.harassment,
+                self.profanity, self.spam_indicators, self.illegal_activities]
+
+    def _category_map(self) -> Dict[str, Dict[str, str]]:
+        return {
             'criminal': self.criminal_offenses,
             'hate': self.hate_speech,
             'violence': self.violence,
@@ -183,7 +250,58 @@ class FlaggedWordsDatabase:
             'illegal': self.illegal_activities,
             'all': self.all_flagged_words
         }
-        return category_map.get(category.lower(), {})
+
+    @staticmethod
+    def _compile_pattern(words: Dict[str, str]) -> "re.Pattern":
+        """
+        Build a regex of the flaggable words anchored at a word start, longest match first
+
+        There is no trailing boundary: many entries are stems ('traffick', 'launder',
+        'kill') that must also match their inflected forms.
+        """
+        flaggable = [word for word, severity in words.items() if severity != 'none']
+        if not flaggable:
+            return re.compile(r"(?!)")
+        return re.compile(r"\b(?:" + _trie_regex(flaggable) + r")")
+
+    @staticmethod
+    def _build_automaton(words: Dict[str, str]):
+        automaton = ahocorasick.Automaton()
+        for word, severity in words.items():
+            if severity != 'none':
+                automaton.add_word(word, word)
+        automaton.make_automaton()
+        return automaton
+
+    @staticmethod
+    def _is_word_char(char: str) -> bool:
+        return char.isalnum() or char == '_'
+
+    def _find_with_automaton(self, automaton, content_lower: str) -> List[str]:
+        """Word-start, non-overlapping matches (leftmost, then longest), like the regex scan"""
+        if len(automaton) == 0:
+            return []
+
+        is_word_char = self._is_word_char
+        candidates = []
+        for end, word in automaton.iter(content_lower):
+            start = end - len(word) + 1
+            if start > 0 and is_word_char(content_lower[start - 1]):
+                continue
+            candidates.append((start, -len(word), word))
+
+        candidates.sort()
+        matches = []
+        next_free = 0
+        for start, neg_length, word in candidates:
+            if start >= next_free:
+                matches.append(word)
+                next_free = start - neg_length
+        return matches
+
+    def get_flagged_words_by_category(self, category: str) -> Dict[str, str]:
+        """Get flagged words for a specific category"""
+        return self._category_map().get(category.lower(), {})
 
     def check_content(self, content: str, category: str = 'all') -> Tuple[List[str], float]:
         """
@@ -192,40 +310,48 @@ class FlaggedWordsDatabase:
         Returns:
             Tuple of (matched_words, total_score)
         """
-        content_lower = content.lower()
+        matched_words, _, total_score = self.scan_content(content, category)
+        return matched_words, total_score
+
+    def scan_content(self, content: str, category: str = 'all') -> Tuple[List[str], List[str], float]:
+        """
+        Check content against flagged words, also reporting each match's severity
+
+        Returns:
+            Tuple of (matched_words, severities, total_score)
+        """
+        category = category.lower()
+        pattern = self._patterns.get(category)
+        if pattern is None:
+            return [], [], 0.0
+
         flagged_words = self.get_flagged_words_by_category(category)
 
-        matched_words = []
-        total_score = 0.0
+        content_lower = content.lower()
+        automaton = self._automatons.get(category)
+        if automaton is not None:
+            found = self._find_with_automaton(automaton, content_lower)
+        else:
+            found = pattern.findall(content_lower)
 
-        for word, severity in flagged_words.items():
-            if word in content_lower:
-                # Skip words marked as 'none' (should not be flagged)
-                if severity == 'none':
-                    continue
-                matched_words.append(word)
-                total_score += self.severity_weights.get(severity, 0.0)
+        # Each word counts once, in order of first appearance
+        matched_words = list(dict.fromkeys(found))
+        severities = [self._severity_lookup[word] for word in matched_words]
+        total_score = sum((self.severity_weights.get(flagged_words[word], 0.0) for word in matched_words), 0.0)
 
-        return matched_words, min(total_score, 2.0)  # Cap at 2.0
+        return matched_words, severities, min(total_score, 2.0)  # Cap at 2.0
 
     def get_critical_words(self) -> List[str]:
         """Get all critical severity words"""
-        return [word for word, severity in self.all_flagged_words.items()
-                if severity == 'critical']
+        return list(self._critical_words)
 
     def get_high_priority_words(self) -> List[str]:
         """Get all high severity words"""
-        return [word for word, severity in self.all_flagged_words.items()
-                if severity in ['critical', 'high']]
+        return list(self._high_priority_words)
 
     def get_word_severity(self, word: str) -> str:
         """Get the severity level of a specific word"""
-        # Check if it's explicitly marked as 'none' (should not be flagged)
-        for category_dict in [self.criminal_offenses, self.hate_speech, self.violence,
-                             self.harassment, self.profanity, self.spam_indicators, self.illegal_activities]:
-            if word.lower() in category_dict and category_dict[word.lower()] == 'none':
-                return 'none'
-        return self.all_flagged_words.get(word.lower(), 'none')
+        return self._severity_lookup.get(word.lower(), 'none')
 
     def get_stats(self) -> Dict[str, int]:
         """Get statistics about the flagged words database"""
@@ -238,8 +364,8 @@ class FlaggedWordsDatabase:
             'profanity': len(self.profanity),
             'spam': len(self.spam_indicators),
             'illegal': len(self.illegal_activities),
-            'critical_words': len(self.get_critical_words()),
-            'high_priority_words': len(self.get_high_priority_words())
+            'critical_words': len(self._critical_words),
+            'high_priority_words': len(self._high_priority_words)
         }
 
 
@@ -254,7 +380,7 @@ def moderate_text_content(content: str) -> Tuple[bool, float, List[str]]:
     Returns:
         Tuple of (flagged, score, reasons)
     """
-    matched_words, score = flagged_words_db.check_content(content)
+    matched_words, severities, score = flagged_words_db.scan_content(content)
 
     # Enhanced scoring logic
     flagged = False
@@ -262,10 +388,9 @@ def moderate_text_content(content: str) -> Tuple[bool, float, List[str]]:
 
     if matched_words:
         # Count critical and high priority words
-        critical_count = sum(1 for word in matched_words
-                           if flagged_words_db.get_word_severity(word) == 'critical')
-        high_count = sum(1 for word in matched_words
-                        if flagged_words_db.get_word_severity(word) == 'high')
+        severity_counts = Counter(severities)
+        critical_count = severity_counts['critical']
+        high_count = severity_counts['high']
 
         # Apply scoring rules
         if critical_count >= 1:
@@ -4,7 +4,13 @@ This file contains Indian legal content for moderation testing.
 Add your Indian laws data here for testing with the moderation API.
 """
 
-INDIAN_LAWS_DATA = [
+from collections import defaultdict, namedtuple
+
+# One immutable record per law; use law._asdict() where a dict is needed
+Law = namedtuple("Law", "id category subcategory content section act")
+
+# Raw entries; add new laws here as dicts
+_RAW_LAWS_DATA = [
     {
         "id": "ipc_302",
         "category": "criminal_law",
@@ -63,20 +69,29 @@ INDIAN_LAWS_DATA = [
     }
 ]
 
+INDIAN_LAWS_DATA = tuple(Law(**law) for law in _RAW_LAWS_DATA)
+del _RAW_LAWS_DATA
+
+# Lookup indexes, built once at import
+_LAWS_BY_ID = {law.id: law for law in INDIAN_LAWS_DATA}
+_laws_by_category = defaultdict(list)
+for _law in INDIAN_LAWS_DATA:
+    _laws_by_category[_law.category].append(_law)
+# Tuples so the shared per-category results can be returned without copying
+_LAWS_BY_CATEGORY = {category: tuple(laws) for category, laws in _laws_by_category.items()}
+del _law, _laws_by_category
+
 def get_all_laws():
     """Get all Indian laws data"""
     return INDIAN_LAWS_DATA
 
 def get_laws_by_category(category):
-    """Get laws by category (criminal_law, employment_law, etc.)"""
-    return [law for law in INDIAN_LAWS_DATA if law["category"] == category]
+    """Get laws by category (criminal_law, employment_law, etc.) as a tuple"""
+    return _LAWS_BY_CATEGORY.get(category, ())
 
 def get_law_by_id(law_id):
     """Get a specific law by ID"""
-    for law in INDIAN_LAWS_DATA:
-        if law["id"] == law_id:
-            return law
-    return None
+    return _LAWS_BY_ID.get(law_id)
 
 def get_sample_content_for_testing():
     """Get sample content for API testing"""
@@ -88,7 +103,7 @@ def get_sample_content_for_testing():
         ("constitutional_law", "fundamental_rights", "freedom of speech and expression")
     ]
 
-# Add your Indian laws data here
+# Add your Indian laws data to _RAW_LAWS_DATA above
 # Example format:
 # {
 #     "id": "unique_id",
@@ -11,6 +11,9 @@ import time
 # Configuration
 BASE_URL = "http://localhost:8000"
 
+# One keep-alive session so every request reuses the same connection
+session = requests.Session()
+
 print("=" * 80)
 print("RL-Powered Content Moderation - Learning Kit")
 print("=" * 80)
@@ -58,7 +61,7 @@ for idx, sample in enumerate(sample_content):
     print(f"Expected: {sample['expected']}")
     
     # Send moderation request
-    response = requests.post(
+    response = session.post(
         f"{BASE_URL}/moderate",
         json={
             "content": sample["content"],
@@ -98,7 +101,7 @@ for idx, (result, feedback) in enumerate(zip(moderation_results, feedback_scenar
     print(f"Moderation ID: {result['moderation_id']}")
     print(f"Feedback: {feedback['type']} (rating: {feedback['rating']})")
     
-    response = requests.post(
+    response = session.post(
         f"{BASE_URL}/feedback",
         json={
             "moderation_id": result["moderation_id"],
@@ -124,21 +127,23 @@ for idx, (result, feedback) in enumerate(zip(moderation_results, feedback_scenar
 
 print("\n\n### Part 3: RL Learning Over Time ###\n")
 
-# Run multiple moderation cycles with similar content
-print("Running 20 moderation cycles to demonstrate learning...\n")
+# Run multiple moderation cycles with similar content. Cycles stay sequential:
+# each one's feedback has to reach the agent before the next moderation.
+NUM_CYCLES = 20
+print(f"Running {NUM_CYCLES} moderation cycles to demonstrate learning...\n")
 
-learning_data = {
-    "iteration": [],
-    "score": [],
-    "confidence": [],
-    "reward": []
-}
+# Preallocated per-cycle results; only the first `completed` entries are filled
+iterations = np.empty(NUM_CYCLES, dtype=np.int32)
+scores = np.empty(NUM_CYCLES, dtype=np.float32)
+confidences = np.empty_like(scores)
+rewards = np.empty_like(scores)
+completed = 0
 
 test_content = "spam spam click here now buy this product urgent!!!"
 
-for i in range(20):
+for i in range(NUM_CYCLES):
     # Moderate content
-    mod_response = requests.post(
+    mod_response = session.post(
         f"{BASE_URL}/moderate",
         json={
             "content": test_content,
@@ -150,7 +155,7 @@ for i in range(20):
         result = mod_response.json()
         
         # Provide feedback (simulating user thumbs up for correct flagging)
-        fb_response = requests.post(
+        fb_response = session.post(
             f"{BASE_URL}/feedback",
             json={
                 "moderation_id": result["moderation_id"],
@@ -162,16 +167,15 @@ for i in range(20):
         if fb_response.status_code == 200:
             fb_result = fb_response.json()
             
-            learning_data["iteration"].append(i + 1)
-            learning_data["score"].append(result["score"])
-            learning_data["confidence"].append(result["confidence"])
-            learning_data["reward"].append(fb_result["reward_value"])
+            iterations[completed] = i + 1
+            scores[completed] = result["score"]
+            confidences[completed] = result["confidence"]
+            rewards[completed] = fb_result["reward_value"]
+            completed += 1
             
             if (i + 1) % 5 == 0:
                 print(f"Iteration {i + 1}: Score={result['score']:.3f}, "
                       f"Confidence={result['confidence']:.3f}")
-    
-    time.sleep(0.2)
 
 # ============================================================================
 # Part 4: Visualization
@@ -180,7 +184,12 @@ for i in range(20):
 print("\n\n### Part 4: Performance Visualization ###\n")
 
 # Create DataFrame
-df = pd.DataFrame(learning_data)
+df = pd.DataFrame({
+    "iteration": iterations[:completed],
+    "score": scores[:completed],
+    "confidence": confidences[:completed],
+    "reward": rewards[:completed]
+})
 
 # Create visualizations
 fig, axes = plt.subplots(2, 2, figsize=(14, 10))
@@ -202,7 +211,7 @@ axes[0, 1].set_title('Confidence Trend')
 axes[0, 1].grid(True, alpha=0.3)
 
 # Plot 3: Cumulative Rewards
-cumulative_reward = df["reward"].cumsum()
+cumulative_reward = rewards[:completed].cumsum()
 axes[1, 0].plot(df["iteration"], cumulative_reward, marker='^', 
                 color='purple', linewidth=2, markersize=6)
 axes[1, 0].set_xlabel('Iteration')
@@ -228,7 +237,7 @@ print("Visualization saved to: logs/moderation_learning_progress.png")
 print("\n\n### Part 5: Overall Statistics ###\n")
 
 # Get stats from API
-stats_response = requests.get(f"{BASE_URL}/stats")
+stats_response = session.get(f"{BASE_URL}/stats")
 
 if stats_response.status_code == 200:
     stats = stats_response.json()
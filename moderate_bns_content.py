@@ -20,6 +20,7 @@ Version: 1.0.0
 import requests
 import json
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any, Tuple
 from bharathi_nyaya_sanhita import create_bns_database, BharatiyaNyayaSanhitaDatabase
 
@@ -28,8 +29,16 @@ API_BASE_URL = "http://localhost:8000/api"
 class BNSContentModerator:
     """Moderates BNS content and displays approved sections"""
 
+    # Sections moderated concurrently; also caps the load put on the API
+    MAX_WORKERS = 16
+
     def __init__(self):
         self.bns_db = create_bns_database()
+        # Reuse one keep-alive connection for all moderation requests
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=self.MAX_WORKERS)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         self.moderated_content = []
         self.rejected_content = []
         self.stats = {
@@ -46,7 +55,7 @@ class BNSContentModerator:
         content = f"BNS Section {section_num}: {section_data['title']}"
 
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{API_BASE_URL}/moderate",
                 json={
                     "content": content,
@@ -86,10 +95,12 @@ class BNSContentModerator:
 
         self.stats["total_sections"] = len(sections_to_process)
 
-        for section_num, section_data in sections_to_process:
-            print(f"\nModerating Section {section_num}: {section_data['title'][:50]}...")
+        # Requests run in parallel; results are handled afterwards in section order
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+            outcomes = list(executor.map(lambda item: self.moderate_section(*item), sections_to_process))
 
-            success, result = self.moderate_section(section_num, section_data)
+        for (section_num, section_data), (success, result) in zip(sections_to_process, outcomes):
+            print(f"\nModerating Section {section_num}: {section_data['title'][:50]}...")
 
             if success and "flagged" in result:
                 moderated_item = {
@@ -122,9 +133,6 @@ class BNSContentModerator:
                 self.stats["rejected"] += 1
                 print(f"   MODERATION FAILED - {result.get('error', 'Unknown error')}")
 
-            # Brief pause to avoid overwhelming the API
-            time.sleep(0.1)
-
         # Calculate statistics
         if self.moderated_content:
             scores = [item["moderation_result"]["score"] for item in self.moderated_content]
@@ -103,19 +103,19 @@ def test_with_full_laws():
     success_count = 0
 
     for law in all_laws:
-        print(f"Testing: {law['act']} - {law['section']}")
-        print(f"   Content: {law['content'][:60]}...")
+        print(f"Testing: {law.act} - {law.section}")
+        print(f"   Content: {law.content[:60]}...")
 
         try:
             response = requests.post(
                 f"{API_BASE_URL}/moderate",
                 json={
-                    "content": law["content"],
+                    "content": law.content,
                     "content_type": "text",
                     "metadata": {
-                        "law_category": law["category"],
-                        "law_section": law["section"],
-                        "act_name": law["act"]
+                        "law_category": law.category,
+                        "law_section": law.section,
+                        "act_name": law.act
                     }
                 },
                 headers={"Content-Type": "application/json"}
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Comprehensive tests for the flagged words database
+"""
+
+import pytest
+
+from flagged_words import FlaggedWordsDatabase, AHOCORASICK_AVAILABLE
+
+
+class TestFlaggedWordsDatabase:
+    """Test suite for FlaggedWordsDatabase matching"""
+
+    def setup_method(self):
+        """Setup test fixtures"""
+        self.db = FlaggedWordsDatabase()
+        # Exercise the regex scan; the automaton is covered separately below
+        self.db._automatons = {}
+
+    def test_inflected_forms_match_stems(self):
+        """Test stems match their inflected forms"""
+        assert self.db.check_content("he was killed")[0] == ["kill"]
+        assert self.db.check_content("the victim was murdered")[0] == ["murder"]
+        assert self.db.check_content("money laundering")[0] == ["launder"]
+
+    def test_stem_scores_count(self):
+        """Test inflected stems contribute to the score"""
+        matched, score = self.db.check_content("drug trafficking and drug abuse")
+
+        assert "traffick" in matched
+        assert score == pytest.approx(1.7)
+
+    def test_match_must_start_a_word(self):
+        """Test a flagged word inside another word isn't matched"""
+        assert self.db.check_content("a skilled worker")[0] == []
+
+    def test_longest_word_wins(self):
+        """Test the longest flagged word at a position is reported"""
+        assert self.db.check_content("they planned to assassinate him")[0] == ["assassinate"]
+
+    @pytest.mark.skipif(not AHOCORASICK_AVAILABLE, reason="pyahocorasick not installed")
+    def test_automaton_matches_regex(self):
+        """Test the Aho-Corasick scan finds the same words as the regex scan"""
+        with_automaton = FlaggedWordsDatabase()
+        texts = [
+            "he was killed",
+            "drug trafficking and drug abuse",
+            "money laundering by a skilled accountant",
+            "they planned to assassinate him",
+        ]
+        for text in texts:
+            assert with_automaton.scan_content(text) == self.db.scan_content(text)
@@ -7,11 +7,13 @@ import pytest
 import asyncio
 import json
 import os
+import shutil
 import tempfile
+import threading
 from unittest.mock import Mock, patch, AsyncMock
 from datetime import datetime
 
-from app.moderation_agent import ModerationAgent
+from app.moderation_agent import ModerationAgent, Experience
 
 
 class TestModerationAgent:
@@ -203,13 +205,12 @@ class TestModerationAgent:
         """Test batch learning from replay buffer"""
         # Add some experiences to replay buffer
         for i in range(10):
-            self.agent.replay_buffer.append({
-                "state": f"state_{i}",
-                "action": i % 3,
-                "reward": 0.5,
-                "next_state": f"state_{i+1}",
-                "timestamp": 0
-            })
+            self.agent.replay_buffer.append(Experience(
+                state=f"state_{i}",
+                action=i % 3,
+                reward=0.5,
+                next_state=f"state_{i+1}"
+            ))
 
         initial_q_size = len(self.agent.q_table)
 
@@ -224,6 +225,7 @@ class TestModerationAgent:
         # Add some Q-values
         self.agent.q_table["test_state"] = {"0": 0.8, "1": 0.2, "2": 0.5}
         self.agent.recent_rewards = [0.5, 0.7, 0.3]
+        self.agent._dirty_flag = True
 
         # Save state
         self.agent._save_state()
@@ -236,6 +238,39 @@ class TestModerationAgent:
         assert new_agent.q_table["test_state"]["0"] == 0.8
         assert len(new_agent.recent_rewards) > 0
 
+    def test_save_state_skipped_when_clean(self):
+        """Test that saving is a no-op when nothing changed"""
+        self.agent._dirty_flag = False
+
+        with patch("builtins.open") as mock_open:
+            self.agent._save_state()
+
+        mock_open.assert_not_called()
+
+    def test_save_state_uses_saver_thread(self):
+        """Test synchronous saves are serialized with background saves"""
+        writers = []
+        original = self.agent._save_snapshot
+
+        def record_snapshot(state):
+            writers.append(threading.current_thread())
+            original(state)
+
+        # State files must live under the working directory
+        state_dir = tempfile.mkdtemp(dir=os.getcwd())
+        self.agent.state_path = os.path.join(state_dir, "agent_state.json")
+        self.agent.q_table["test_state"] = {"0": 0.8, "1": 0.2, "2": 0.5}
+        self.agent._dirty_flag = True
+        try:
+            with patch.object(self.agent, "_save_snapshot", side_effect=record_snapshot):
+                self.agent._save_state()
+
+            assert writers and writers[0] is not threading.main_thread()
+            with open(self.agent.state_path) as f:
+                assert json.load(f)["q_table"]["test_state"]["0"] == 0.8
+        finally:
+            shutil.rmtree(state_dir, ignore_errors=True)
+
     @pytest.mark.asyncio
     async def test_pretraining(self):
         """Test agent pretraining with examples"""
@@ -360,13 +395,12 @@ class TestModerationAgent:
         self.agent.q_table[state_key]["1"] = -1000  # Too low
 
         # Add to replay buffer
-        self.agent.replay_buffer.append({
-            "state": state_key,
-            "action": 0,
-            "reward": 1.0,
-            "next_state": state_key,
-            "timestamp": 0
-        })
+        self.agent.replay_buffer.append(Experience(
+            state=state_key,
+            action=0,
+            reward=1.0,
+            next_state=state_key
+        ))
 
         # Perform batch update
         self.agent.batch_update_from_replay(batches=1, batch_size=1)
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Comprehensive tests for observability helpers
+"""
+
+import json
+import logging
+
+from app.observability import StructuredJSONFormatter
+
+
+class TestStructuredJSONFormatter:
+    """Test suite for StructuredJSONFormatter"""
+
+    def _record(self, **extra) -> logging.LogRecord:
+        record = logging.LogRecord("test", logging.INFO, __file__, 1, "hello", None, None)
+        record.__dict__.update(extra)
+        return record
+
+    def test_extra_fields_included(self):
+        """Test extra= fields are rendered alongside the message"""
+        line = StructuredJSONFormatter().format(self._record(user_id="u1"))
+
+        payload = json.loads(line)
+        assert payload["message"] == "hello"
+        assert payload["user_id"] == "u1"
+
+    def test_non_string_keys(self):
+        """Test extra= dicts with non-string keys are still rendered"""
+        line = StructuredJSONFormatter().format(self._record(details={1: "a"}))
+
+        assert json.loads(line)["details"] == {"1": "a"}
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Comprehensive tests for the storage backends
+"""
+
+import pytest
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# The module-level storage manager creates its directories on import
+os.environ.setdefault("LOCAL_STORAGE_PATH", tempfile.mkdtemp())
+
+from app.storage import (
+    StorageConfig, StorageManager, StorageReadError, HybridStorageBackend, S3StorageBackend,
+    ZSTD_AVAILABLE
+)
+
+
+class FakeS3Backend:
+    """In-memory stand-in for S3StorageBackend; uploads of "blocker" wait on an event"""
+
+    def __init__(self):
+        self.objects = {}
+        self.release = threading.Event()
+
+    def save_file(self, segment, filename, content, content_type="application/octet-stream"):
+        if filename == "blocker":
+            self.release.wait(5)
+        self.objects[(segment, filename)] = content
+        return f"s3://test/{segment}/{filename}"
+
+    def delete_file(self, segment, filename):
+        return self.objects.pop((segment, filename), None) is not None
+
+
+class FakeClientError(Exception):
+    """Mimics botocore's ClientError, which carries the S3 error code in .response"""
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+
+
+class FakeBody:
+    def __init__(self, data):
+        self.data = data
+
+    def read(self):
+        return self.data
+
+
+class FakeS3Client:
+    """Serves get_object ranges of one object; replace() swaps in a new version"""
+
+    def __init__(self, data):
+        self.version = 0
+        self.data = data
+        self.on_first_range = None
+
+    def replace(self, data):
+        self.version += 1
+        self.data = data
+
+    def get_object(self, Bucket, Key, Range=None, IfMatch=None):
+        etag = f'"v{self.version}"'
+        if IfMatch is not None and IfMatch != etag:
+            raise FakeClientError("PreconditionFailed")
+        start, end = (int(n) for n in Range[len("bytes="):].split("-"))
+        chunk = self.data[start:end + 1]
+        response = {"Body": FakeBody(chunk), "ETag": etag,
+                    "ContentRange": f"bytes {start}-{start + len(chunk) - 1}/{len(self.data)}"}
+        if start == 0 and self.on_first_range is not None:
+            callback, self.on_first_range = self.on_first_range, None
+            callback()
+        return response
+
+
+class TestS3RangedDownload:
+    """Test suite for S3StorageBackend byte-range downloads"""
+
+    def setup_method(self):
+        """Setup test fixtures"""
+        self.backend = S3StorageBackend(StorageConfig())
+        self.backend.RANGE_PART_SIZE = 4
+
+    def test_multi_range_download(self):
+        """Test an object spanning several ranges is reassembled in order"""
+        client = FakeS3Client(b"0123456789abcdef!")
+
+        assert self.backend._download(client, "temp/obj") == b"0123456789abcdef!"
+
+    def test_restarts_when_object_replaced(self):
+        """Test an overwrite during the download restarts it instead of mixing versions"""
+        client = FakeS3Client(b"a" * 10)
+        client.on_first_range = lambda: client.replace(b"b" * 10)
+
+        assert self.backend._download(client, "temp/obj") == b"b" * 10
+
+    def test_fails_when_object_keeps_changing(self):
+        """Test the download gives up after DOWNLOAD_ATTEMPTS restarts"""
+        client = FakeS3Client(b"a" * 10)
+
+        def keep_replacing():
+            client.replace(b"b" * 10)
+            client.on_first_range = keep_replacing
+        client.on_first_range = keep_replacing
+
+        with pytest.raises(FakeClientError):
+            self.backend._download(client, "temp/obj")
+
+
+class TestHybridStorageBackend:
+    """Test suite for HybridStorageBackend mirroring"""
+
+    def setup_method(self):
+        """Setup test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        config = StorageConfig()
+        config.LOCAL_STORAGE_PATH = Path(self.temp_dir)
+        config.HYBRID_LOCAL_MAX_BYTES = 16
+        self.backend = HybridStorageBackend(config)
+        self.fake_s3 = FakeS3Backend()
+        self.backend.s3 = self.fake_s3
+
+    def teardown_method(self):
+        """Cleanup test fixtures"""
+        self.fake_s3.release.set()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_small_file_is_mirrored(self):
+        """Test small files are stored locally and mirrored to S3"""
+        self.backend.save_file("temp", "note.txt", b"small")
+        self.backend.flush()
+
+        assert self.backend.local.get_file("temp", "note.txt") == b"small"
+        assert self.fake_s3.objects[("temp", "note.txt")] == b"small"
+
+    def test_delete_cancels_queued_mirror(self):
+        """Test a queued mirror upload doesn't resurrect a deleted file"""
+        # Hold the worker so the next upload stays queued
+        self.backend.save_file("temp", "blocker", b"x")
+        self.backend.save_file("temp", "note.txt", b"small")
+        self.backend.delete_file("temp", "note.txt")
+
+        self.fake_s3.release.set()
+        self.backend.flush()
+
+        assert ("temp", "note.txt") not in self.fake_s3.objects
+        assert self.backend.local.get_file("temp", "note.txt") is None
+
+    def test_large_save_supersedes_queued_mirror(self):
+        """Test a queued small mirror doesn't overwrite a newer large upload"""
+        self.backend.save_file("temp", "blocker", b"x")
+        self.backend.save_file("temp", "note.txt", b"small")
+        self.backend.save_file("temp", "note.txt", b"large content" * 4)
+
+        self.fake_s3.release.set()
+        self.backend.flush()
+
+        assert self.fake_s3.objects[("temp", "note.txt")] == b"large content" * 4
+        assert self.backend.local.get_file("temp", "note.txt") is None
+
+    def test_delete_waits_for_upload_in_progress(self):
+        """Test delete waits for a running upload of the same file"""
+        self.backend.save_file("temp", "blocker", b"x")
+        deleter = threading.Thread(target=self.backend.delete_file, args=("temp", "blocker"))
+        # Give the worker time to start uploading before the delete runs
+        while ("temp", "blocker") not in self.backend._uploading:
+            time.sleep(0.01)
+        deleter.start()
+        deleter.join(0.1)
+        assert deleter.is_alive()
+
+        self.fake_s3.release.set()
+        deleter.join(5)
+        self.backend.flush()
+
+        assert ("temp", "blocker") not in self.fake_s3.objects
+
+
+class RecordingBackend:
+    """In-memory backend that records every call made to it"""
+
+    def __init__(self):
+        self.objects = {}
+        self.calls = []
+        self.fail_reads = 0
+
+    def save_file(self, segment, filename, content, content_type="application/octet-stream"):
+        self.calls.append(("save", filename))
+        self.objects[(segment, filename)] = content
+        return f"mem://{segment}/{filename}"
+
+    def read_file(self, segment, filename):
+        self.calls.append(("get", filename))
+        if self.fail_reads:
+            self.fail_reads -= 1
+            raise StorageReadError(f"Error reading file {segment}/{filename}: timed out")
+        return self.objects.get((segment, filename))
+
+    def list_files(self, segment):
+        self.calls.append(("list", segment))
+        return [name for seg, name in self.objects if seg == segment]
+
+    def delete_file(self, segment, filename):
+        self.calls.append(("delete", filename))
+        return self.objects.pop((segment, filename), None) is not None
+
+
+class TestStorageManagerCompression:
+    """Test suite for StorageManager's choice between .zst and plain variants"""
+
+    def setup_method(self):
+        """Setup test fixtures"""
+        self.manager = StorageManager()
+        self.backend = RecordingBackend()
+        self.manager.backend = self.backend
+        # Files below COMPRESS_MIN_BYTES are stored plain even with compression on
+        self.manager._compress = True
+
+    def test_save_does_not_delete_unknown_variant(self):
+        """Test saving doesn't issue a delete for a .zst variant that doesn't exist"""
+        self.manager.save_file("temp", "a.txt", b"small", "text/plain")
+
+        assert ("delete", "a.txt.zst") not in self.backend.calls
+
+    def test_read_does_not_probe_compressed_name(self):
+        """Test reads of plain files go straight to the plain name"""
+        self.manager.save_file("temp", "a.txt", b"small", "text/plain")
+
+        assert self.manager.get_file("temp", "a.txt") == b"small"
+        assert ("get", "a.txt.zst") not in self.backend.calls
+
+    def test_read_uses_listing_for_files_saved_elsewhere(self):
+        """Test files this process didn't write are resolved with one listing"""
+        self.backend.objects[("temp", "a.txt")] = b"x"
+        self.backend.objects[("temp", "b.txt")] = b"y"
+
+        assert self.manager.get_file("temp", "a.txt") == b"x"
+        assert self.manager.get_file("temp", "b.txt") == b"y"
+        assert self.backend.calls == [("list", "temp"), ("get", "a.txt"), ("get", "b.txt")]
+
+    def test_save_keeps_listing_cached(self):
+        """Test a save updates the cached listing instead of forcing a new one"""
+        assert self.manager.list_files("temp") == []
+        self.manager.save_file("temp", "a.txt", b"small", "text/plain")
+
+        assert self.manager.list_files("temp") == ["a.txt"]
+        assert self.backend.calls.count(("list", "temp")) == 1
+
+    def test_delete_removes_only_stored_variant(self):
+        """Test deleting a plain file doesn't also delete a .zst name"""
+        self.manager.save_file("temp", "a.txt", b"small", "text/plain")
+        assert self.manager.delete_file("temp", "a.txt")
+
+        assert ("delete", "a.txt.zst") not in self.backend.calls
+        assert self.manager.list_files("temp") == []
+
+
+@pytest.mark.skipif(not ZSTD_AVAILABLE, reason="zstandard not installed")
+class TestStorageManagerZstd:
+    """Test suite for StorageManager reads and writes of zstd-compressed files"""
+
+    def setup_method(self):
+        """Setup two managers sharing one backend, like two worker processes"""
+        self.backend = RecordingBackend()
+        self.writer = StorageManager()
+        self.reader = StorageManager()
+        for manager in (self.writer, self.reader):
+            manager.backend = self.backend
+            manager._compress = True
+        self.document = {"text": "x" * 8192}
+
+    def test_round_trip(self):
+        """Test large JSON is stored compressed and read back"""
+        self.writer.save_json("temp", "c.json", self.document)
+
+        assert ("temp", "c.json.zst") in self.backend.objects
+        assert self.writer.get_json("temp", "c.json") == self.document
+
+    def test_sees_file_compressed_after_listing_cached(self):
+        """Test a .zst file written by another process after our listing is found"""
+        assert self.reader.list_files("temp") == []
+        self.writer.save_json("temp", "c.json", self.document)
+
+        assert self.reader.get_json("temp", "c.json") == self.document
+
+    def test_uncompressed_file_with_zst_name(self):
+        """Test an upload that merely ends in .zst is returned as stored"""
+        self.backend.objects[("temp", "x.txt.zst")] = b"not compressed"
+
+        assert self.reader.list_files("temp") == ["x.txt"]
+        assert self.reader.get_file("temp", "x.txt") == b"not compressed"
+
+    def test_corrupt_frame_is_an_error(self):
+        """Test a corrupt zstd file reads as None without being cached as missing"""
+        self.backend.objects[("temp", "x.txt.zst")] = b"\x28\xb5\x2f\xfd" + b"garbage"
+
+        assert self.reader.get_file("temp", "x.txt") is None
+        assert not self.reader._known_missing("temp", "x.txt")
+
+
+class TestStorageManagerNegativeCache:
+    """Test suite for StorageManager's cache of files known not to exist"""
+
+    def setup_method(self):
+        """Setup test fixtures"""
+        self.manager = StorageManager()
+        self.backend = RecordingBackend()
+        self.manager.backend = self.backend
+
+    def test_missing_file_is_remembered(self):
+        """Test a confirmed miss is served from the cache"""
+        assert self.manager.get_file("temp", "absent.txt") is None
+        assert self.manager.get_file("temp", "absent.txt") is None
+
+        assert self.backend.calls.count(("get", "absent.txt")) == 1
+
+    def test_read_error_is_not_remembered(self):
+        """Test a failed read isn't cached as a missing file"""
+        self.backend.objects[("temp", "a.txt")] = b"x"
+        self.backend.fail_reads = 1
+
+        assert self.manager.get_file("temp", "a.txt") is None
+        assert self.manager.get_file("temp", "a.txt") == b"x"
+
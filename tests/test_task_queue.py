@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Comprehensive tests for the AsyncTaskQueue
+"""
+
+import pytest
+import asyncio
+
+from app.task_queue import AsyncTaskQueue, TaskQueueFull, TaskStatus
+
+
+class TestAsyncTaskQueue:
+    """Test suite for AsyncTaskQueue"""
+
+    def test_add_task_raises_when_full(self):
+        """Test add_task gives up once the queue stays full past enqueue_timeout"""
+        async def run():
+            queue = AsyncTaskQueue(max_queue_size=2, enqueue_timeout=0.05)
+            await queue.add_task("cleanup", {})
+            await queue.add_task("cleanup", {})
+            with pytest.raises(TaskQueueFull):
+                await queue.add_task("cleanup", {})
+
+        asyncio.run(run())
+
+    def test_cancel_frees_queue_slot(self):
+        """Test cancelling a pending task lets another one be queued"""
+        async def run():
+            queue = AsyncTaskQueue(max_queue_size=2, enqueue_timeout=0.05)
+            first = await queue.add_task("cleanup", {})
+            await queue.add_task("cleanup", {})
+
+            assert await queue.cancel_task(first)
+            await queue.add_task("cleanup", {})
+
+            assert len(queue._pending) == 2
+            assert first not in queue._pending
+            assert queue._get_task(first).status == TaskStatus.FAILED
+
+        asyncio.run(run())